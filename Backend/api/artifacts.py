@@ -0,0 +1,74 @@
+import re
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+
+from Backend.core.deps import session_clinic_id
+from Backend.core.security import get_current_session
+from Backend.services.artifact_store import artifacts
+
+router = APIRouter(prefix="/api", tags=["artifacts"])
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_IMMUTABLE = "private, max-age=31536000, immutable"
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Single byte range as inclusive (start, end); None when the header is unusable
+    (multi-range or malformed), which means the whole body is served.
+    Raises ValueError for a well-formed but unsatisfiable range."""
+    m = _RANGE.match(header.strip())
+    if not m or m.group(1) == m.group(2) == "":
+        return None
+    first, last = m.group(1), m.group(2)
+    if first == "":  # suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end
+
+
+@router.get("/artifacts/{digest}")
+async def get_artifact_route(digest: str, request: Request):
+    """Serve a stored chart image or audio file by its sha256.
+
+    Content never changes for a hash, so responses are cacheable forever;
+    supports If-None-Match and single byte ranges (audio seeking).
+    Uses the session cookie because <img>/<audio> cannot send a bearer header.
+    Blobs are shared across clinics, so only clinics recorded as owners see one.
+    """
+    session = get_current_session(request)
+    if not session:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not logged in")
+    clinic_id = await run_in_threadpool(session_clinic_id, session)
+    if not artifacts.exists(digest) or not artifacts.owned_by(digest, clinic_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Artifact not found")
+
+    etag = f'"{digest}"'
+    headers = {"Cache-Control": _IMMUTABLE, "ETag": etag, "Accept-Ranges": "bytes"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    media_type = artifacts.media_type(digest) or "application/octet-stream"
+    size = artifacts.size(digest)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                                detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return Response(content=await run_in_threadpool(artifacts.read, digest, start, end), media_type=media_type,
+                            status_code=status.HTTP_206_PARTIAL_CONTENT, headers=headers)
+
+    return Response(content=await run_in_threadpool(artifacts.read, digest), media_type=media_type, headers=headers)
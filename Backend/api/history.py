@@ -1,9 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Annotated
-from Backend.config.constants import MODEL_CONFIG, EXPLAIN_PROMPT
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Annotated, Optional
+from Backend.config.constants import EXPLAIN_PROMPT, TTS_WAIT_SECONDS
 from Backend.utils.tools import text_to_speech
+from Backend.services.chat_events import ChatEventHandler
+from Backend.services.tts_service import pending_speech, speech_key, speech_url
 
-from Backend.services.chatbot_service import create_agent
+from Backend.services.chatbot_service import get_agent
+from Backend.services.ingest_jobs import ensure_ingested
 from Database.db_history import (
     create_conversation,
     list_conversations,
@@ -11,6 +18,7 @@ from Database.db_history import (
     delete_conversation,
     add_message,
     list_messages,
+    encode_cursor,
     rename_conversation,
     title_from_text,
 )
@@ -21,101 +29,259 @@ from Backend.models.schemas import (
     ConversationWithMessages,
 )
 from Backend.core.deps import get_current_clinic
-from Backend.utils.tools import bots, is_image
+from Backend.core.limits import llm_limiter, LimiterFull
+from Backend.services.result_store import drop_conversation_results
+from Backend.utils.tools import bots, is_chart_spec, is_image
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api", tags=["chatbot"])
 CurrentClinic = Annotated[dict, Depends(get_current_clinic)]
 
+_turns: set = set()  # in-flight streamed replies
+
 class ConversationCreate(BaseModel):
     title: str
 
+# Handlers are async: blocking DB calls go through run_in_threadpool for the
+# duration of the query only, and LLM calls are awaited, so a slow chat never
+# pins a worker thread that /api/conversations or /healthz would need.
+
 @router.post("/conversations", response_model=ConversationOut, status_code=201)
-def create_conversation_route(body: ConversationCreate, current: CurrentClinic):
+async def create_conversation_route(body: ConversationCreate, current: CurrentClinic):
     """Create a new conversation for the current clinic."""
-    conv_id = create_conversation(clinic_id=current["clinic_id"], title=body.title)
+    conv_id = await run_in_threadpool(create_conversation, clinic_id=current["clinic_id"], title=body.title)
+    await run_in_threadpool(ensure_ingested, current["clinic_id"])
 
-    bots[conv_id] = create_agent(MODEL_CONFIG, current["clinic_id"])
+    await run_in_threadpool(get_agent, conv_id, current["clinic_id"])  # warm the agent cache
 
-    conv = get_conversation(conversation_id=conv_id, clinic_id=current["clinic_id"])
+    conv = await run_in_threadpool(get_conversation, conversation_id=conv_id, clinic_id=current["clinic_id"])
     if not conv:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create conversation")
     return ConversationOut(id=conv.id, title=conv.title)
 
 
 @router.get("/conversations", response_model=list[ConversationOut])
-def list_conversations_route(current: CurrentClinic):
-    """List conversations for the current clinic (most-recent first)."""
-    convs = list_conversations(clinic_id=current["clinic_id"])
-    return [ConversationOut(id=c.id, title=c.title) for c in convs]
+async def list_conversations_route(
+    response: Response,
+    current: CurrentClinic,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    before: Optional[str] = None,
+    stats: bool = False,
+):
+    """List conversations for the current clinic (most-recent first).
+
+    With `limit`, the X-Next-Before header carries the cursor for the next
+    page (pass it back as `before`). `stats=true` adds message counts and
+    last-activity timestamps.
+    """
+    try:
+        convs = await run_in_threadpool(
+            list_conversations,
+            clinic_id=current["clinic_id"],
+            limit=limit + 1 if limit else None,
+            before=before,
+            with_stats=stats,
+        )
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if limit and len(convs) > limit:
+        convs = convs[:limit]
+        response.headers["X-Next-Before"] = encode_cursor(convs[-1])
+    return [
+        ConversationOut(
+            id=c.id,
+            title=c.title,
+            updated_at=c.updated_at,
+            message_count=c.message_count,
+            last_activity=c.last_activity,
+        )
+        for c in convs
+    ]
 
 
 
 @router.get("/conversations/{conversation_id}", response_model=ConversationWithMessages)
-def get_conversation_route(conversation_id: int, current: CurrentClinic):
-    """Fetch a conversation (ownership enforced) with its messages."""
-    conv = get_conversation(conversation_id=conversation_id, clinic_id=current["clinic_id"])
+async def get_conversation_route(
+    conversation_id: int,
+    current: CurrentClinic,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    before: Optional[int] = Query(None, ge=1),
+):
+    """Fetch a conversation (ownership enforced) with its messages.
+
+    Without `limit` the whole thread is returned. With it, the newest `limit`
+    messages (older than message id `before`, if given) come back in
+    chronological order, and `next_before` is the cursor for the previous page.
+    """
+    conv = await run_in_threadpool(get_conversation, conversation_id=conversation_id, clinic_id=current["clinic_id"])
     if not conv:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
-    msgs = list_messages(conversation_id=conv.id)
+    # one extra row tells whether an older page exists
+    msgs = await run_in_threadpool(
+        list_messages, conversation_id=conv.id, limit=limit + 1 if limit else None, before=before
+    )
+    next_before = None
+    if limit and len(msgs) > limit:
+        msgs = msgs[1:]
+        next_before = msgs[0]["id"]
     print("AAAAA")
     print(msgs)
     return ConversationWithMessages(
         conversation=ConversationOut(id=conv.id, title=conv.title),
-        messages=[MessageOut(id=m["id"], role=m["role"], content=m["content"]) for m in msgs],
+        messages=[
+            MessageOut(id=m["id"], role=m["role"], content=m["content"], created_at=m["created_at"])
+            for m in msgs
+        ],
+        next_before=next_before,
     )
 
 
-@router.post("/conversations/{conversation_id}/messages", response_model=MessageOut)
-def send_message_route(conversation_id: int, payload: MessageIn, current: CurrentClinic):
-    """Append a user message to a conversation you own and return the thread."""
-    conv = get_conversation(conversation_id=conversation_id, clinic_id=current["clinic_id"])
+async def _compose_reply(chat_fn, content: str, clinic_id: str, callbacks: Optional[list] = None) -> tuple[str, str]:
+    """Run the agent and build the stored reply (image + explanation + audio tag).
+    Returns the reply and the key of the speech queued for it (readable by clinic_id)."""
+    bot_reply = await chat_fn.ainvoke(content, callbacks)
+    if is_image(bot_reply) or is_chart_spec(bot_reply):
+        explanation = await chat_fn.ainvoke(EXPLAIN_PROMPT, callbacks)
+        tts = text_to_speech(explanation, clinic_id)
+        clean_image = "".join(bot_reply.split())
+        tag = "img" if is_image(clean_image) else "chart"  # <chart>: Vega-Lite spec drawn by the browser
+        return f"<{tag}>{clean_image}</{tag}>\n\n{explanation}\n\n{tts}\n", speech_key(explanation)
+    tts = text_to_speech(bot_reply, clinic_id)
+    return f"{bot_reply}\n\n{tts}\n", speech_key(bot_reply)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _too_busy(e: LimiterFull) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f"Assistant is busy ({e.waiting} requests queued), try again shortly",
+        headers={"Retry-After": str(e.retry_after), "X-Queue-Length": str(e.waiting)},
+    )
+
+
+async def _prepare_turn(conversation_id: int, payload: MessageIn, current: dict):
+    """Ownership and input checks and agent lookup. The user message is persisted
+    by _save_user_message once an LLM slot is held, so a turn rejected by the
+    limiter leaves no unanswered message in the stored history."""
+    conv = await run_in_threadpool(get_conversation, conversation_id=conversation_id, clinic_id=current["clinic_id"])
     if not conv:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
-    
-    from Database.firebaseIngest import ingest_clinic_from_firebase
-    ingest_clinic_from_firebase(current["clinic_id"])
 
     content = (payload.content or "").strip()
     if not content:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Message content required")
 
-    # Add user message
-    add_message(conversation_id=conv.id, clinic_id=current["clinic_id"], role="user", content=content)
+    if llm_limiter.full():
+        raise _too_busy(LimiterFull(llm_limiter.waiting, retry_after=int(llm_limiter.queue_timeout)))
 
-    if conv.id not in bots:
-        bots[conv.id] = create_agent(MODEL_CONFIG, current["clinic_id"])
+    # Conversations created before a restart (or a lost database file) skip
+    # create_conversation_route, so the clinic's tables are checked here too.
+    await run_in_threadpool(ensure_ingested, current["clinic_id"])
+    # Fetch (or rebuild from stored history) before the new message is persisted
+    chat_fn = await run_in_threadpool(get_agent, conv.id, current["clinic_id"])
+    return conv, content, chat_fn
 
-    chat_fn = bots[conv.id] # get the callable conversation function
-    try:
-        bot_reply = chat_fn(content)
-        if is_image(bot_reply):
-            explanation = chat_fn(EXPLAIN_PROMPT)
-            tts = text_to_speech(explanation)
-            clean_image = "".join(bot_reply.split())
-            bot_reply = f"<img>{clean_image}</img>\n\n{explanation}\n\n{tts}\n"
-        else:
-            tts = text_to_speech(bot_reply)
-            bot_reply = f"{bot_reply}\n\n{tts}\n"
 
+async def _save_user_message(conv, content: str, current: dict) -> None:
+    await run_in_threadpool(add_message, conversation_id=conv.id, clinic_id=current["clinic_id"], role="user", content=content)
+
+
+@router.post("/conversations/{conversation_id}/messages", response_model=MessageOut)
+async def send_message_route(conversation_id: int, payload: MessageIn, current: CurrentClinic):
+    """Append a user message to a conversation you own and return the thread."""
+    conv, content, chat_fn = await _prepare_turn(conversation_id, payload, current)
+
+    try:
+        async with llm_limiter.slot():
+            await _save_user_message(conv, content, current)
+            bot_reply, _ = await _compose_reply(chat_fn, content, current["clinic_id"])
+    except LimiterFull as e:
+        raise _too_busy(e) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail="Assistant failed to reply") from e
 
-    add_message(conversation_id=conv.id, clinic_id=current["clinic_id"], role="assistant", content=bot_reply)
+    msg_id = await run_in_threadpool(add_message, conversation_id=conv.id, clinic_id=current["clinic_id"], role="assistant", content=bot_reply)
+    if msg_id is None:  # conversation deleted while the reply was generated
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
 
     #if conv.title == "New conversation":
     #    rename_conversation(conversation_id=conv.id, clinic_id=current["clinic_id"], new_title=title_from_text(content))
 
-    return MessageOut(id=0, role="assistant", content=bot_reply)
+    return MessageOut(id=msg_id, role="assistant", content=bot_reply)
+
+
+@router.post("/conversations/{conversation_id}/messages/stream")
+async def stream_message_route(conversation_id: int, payload: MessageIn, current: CurrentClinic):
+    """Like send_message_route, but streams progress as Server-Sent Events.
+
+    Events: start, queued (position while waiting for an LLM slot), tool_start,
+    sql, tool_end, token, chart, message (the persisted reply), audio (speech is
+    ready), error, end.
+    """
+    conv, content, chat_fn = await _prepare_turn(conversation_id, payload, current)
+
+    loop = asyncio.get_running_loop()
+    events: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+
+    def emit(event: str, data: dict) -> None:
+        # callbacks may fire on executor threads
+        loop.call_soon_threadsafe(events.put_nowait, _sse(event, data))
+
+    async def run() -> None:
+        try:
+            async with llm_limiter.slot(on_queued=lambda pos: emit("queued", {"position": pos})):
+                await _save_user_message(conv, content, current)
+                bot_reply, audio_key = await _compose_reply(chat_fn, content, current["clinic_id"], [ChatEventHandler(emit)])
+            msg_id = await run_in_threadpool(add_message, conversation_id=conv.id, clinic_id=current["clinic_id"], role="assistant", content=bot_reply)
+            if msg_id is None:  # conversation deleted while the reply was generated
+                emit("error", {"detail": "Conversation not found", "status": 404})
+                return
+            emit("message", {"id": msg_id, "role": "assistant", "content": bot_reply})
+
+            try:
+                future = pending_speech(audio_key)
+                if future is not None:
+                    await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=TTS_WAIT_SECONDS)
+                emit("audio", {"src": speech_url(audio_key)})
+            except Exception as e:
+                emit("audio", {"src": None, "error": str(e) or "Speech unavailable"})
+        except LimiterFull as e:
+            emit("error", {"detail": "Assistant is busy, try again shortly", "status": 429, "retry_after": e.retry_after})
+        except Exception as e:
+            print(f"Streaming reply for conversation {conv.id} failed: {e}")
+            emit("error", {"detail": "Assistant failed to reply"})
+        finally:
+            emit("end", {})
+            loop.call_soon_threadsafe(events.put_nowait, None)
+
+    emit("start", {"conversation_id": conv.id})
+    # Held in _turns so the reply is still persisted if the client disconnects.
+    task = asyncio.create_task(run())
+    _turns.add(task)
+    task.add_done_callback(_turns.discard)
+
+    async def stream():
+        while (chunk := await events.get()) is not None:
+            yield chunk
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.delete("/conversations/{conversation_id}")
-def delete_conversation_route(conversation_id: int, current: CurrentClinic):
+async def delete_conversation_route(conversation_id: int, current: CurrentClinic):
     """Delete a conversation you own (cascades to messages)."""
-    conv = get_conversation(conversation_id=conversation_id, clinic_id=current["clinic_id"])
+    conv = await run_in_threadpool(get_conversation, conversation_id=conversation_id, clinic_id=current["clinic_id"])
     if not conv:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
-    delete_conversation(conversation_id=conv.id, clinic_id=current["clinic_id"])
+    await run_in_threadpool(delete_conversation, conversation_id=conv.id, clinic_id=current["clinic_id"])
 
     bots.pop(conv.id, None)
+    drop_conversation_results(conv.id)
     return {"ok": True}
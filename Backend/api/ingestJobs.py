@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Annotated, List
+
+from Backend.core.deps import get_current_clinic
+from Backend.models.schemas import IngestJobOut
+from Backend.services.ingest_jobs import enqueue_ingest, get_job, list_jobs
+
+CurrentClinic = Annotated[dict, Depends(get_current_clinic)]
+router = APIRouter(prefix="/api", tags=["ingest"])
+
+
+@router.post("/ingest", response_model=IngestJobOut, status_code=status.HTTP_202_ACCEPTED)
+def start_ingest_route(current: CurrentClinic):
+    """Queue a (re)ingestion of the current clinic's uploaded files."""
+    return IngestJobOut.model_validate(enqueue_ingest(str(current["clinic_id"])))
+
+
+@router.get("/ingest/jobs", response_model=List[IngestJobOut])
+def list_ingest_jobs_route(current: CurrentClinic):
+    """Recent ingestion jobs for the current clinic (newest first)."""
+    return [IngestJobOut.model_validate(j) for j in list_jobs(str(current["clinic_id"]))]
+
+
+@router.get("/ingest/jobs/{job_id}", response_model=IngestJobOut)
+def get_ingest_job_route(job_id: str, current: CurrentClinic):
+    """Status of a single ingestion job you own."""
+    job = get_job(job_id)
+    if not job or job.clinic_id != str(current["clinic_id"]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return IngestJobOut.model_validate(job)
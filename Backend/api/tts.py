@@ -0,0 +1,34 @@
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import RedirectResponse
+
+from Backend.config.constants import TTS_WAIT_SECONDS
+from Backend.core.security import get_current_session
+from Backend.services.artifact_store import artifact_url
+from Backend.services.tts_service import aget_speech, is_speech_key
+
+router = APIRouter(prefix="/api", tags=["tts"])
+
+
+@router.get("/tts/{key}")
+async def get_speech_route(key: str, request: Request):
+    """Redirect to the synthesized speech in the artifact store, waiting for it
+    if synthesis is still running.
+
+    Audio elements cannot send a bearer header, so this uses the session cookie.
+    """
+    if not get_current_session(request):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not logged in")
+    if not is_speech_key(key):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Audio not found")
+    try:
+        digest = await aget_speech(key, timeout=TTS_WAIT_SECONDS)
+    except TimeoutError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Audio not ready yet",
+                            headers={"Retry-After": "5"})
+    if digest is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Audio not found")
+    return RedirectResponse(
+        artifact_url(digest),
+        status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+        headers={"Cache-Control": "private, max-age=31536000, immutable"},
+    )
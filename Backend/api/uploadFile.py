@@ -4,6 +4,7 @@ from Backend.config.constants import MODEL_CONFIG, EXPLAIN_PROMPT
 from Backend.services.chatbot_service import create_agent
 from Backend.core.deps import get_current_clinic
 from Backend.utils.tools import bots, is_image
+from Backend.services.ingest_jobs import enqueue_ingest
 from Database.firebaseActions import upload_to_firebase, download_from_firebase, download_all_from_firebase, delete_from_firebase, get_download_url
 
 
@@ -13,21 +14,23 @@ router = APIRouter(prefix = "/api", tags=["file-upload"])
 @router.post("/upload", status_code=status.HTTP_202_ACCEPTED)
 async def upload_to_firebase_placeholder(current: CurrentClinic, file: UploadFile = File(...)):
     """
-    Placeholder endpoint that receives a file and will later
-    stream it to Firebase Storage.
-
-    For now, we just acknowledge receipt.
+    Stores the file in Firebase Storage and queues a background
+    ingestion job for the clinic. Poll /api/ingest/jobs/{job_id}
+    to know when the new data is queryable.
     """
     clinic_id = str(current["clinic_id"])
 
     if not file or not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
     upload_to_firebase(clinic_id, file)
+    job = enqueue_ingest(clinic_id)
     return {
         "status": "accepted",
-        "message": "Upload route reachable; Firebase integration pending.",
+        "message": "File stored; ingestion queued.",
         "filename": file.filename,
         "content_type": file.content_type,
+        "job_id": job.id,
+        "job_url": f"/api/ingest/jobs/{job.id}",
     }
 
 @router.get("/download/{file_name}", status_code=200)
@@ -50,6 +53,7 @@ async def delete_file_from_firebase(current: CurrentClinic, file_name: str):
 
     if not existed:
         raise HTTPException(status_code=404, detail="File not found")
+    enqueue_ingest(clinic_id)  # drops the table of the deleted file
     return  # 204 No Content
 
 
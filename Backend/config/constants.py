@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from Backend.config.classes import ModelConfig
 
@@ -6,11 +7,96 @@ MODEL_CONFIG = ModelConfig()
 DB_FILE = Path(__file__).resolve().parents[2] / "data" / "clinic.duckdb"
 DATA_PATH = f"duckdb:///{DB_FILE.as_posix()}"
 
+# Page router (Backend/utils/router.py): ROUTER_RELOAD=1 watches Backend/controllers and hot-reloads
+ROUTER_RELOAD = os.getenv("ROUTER_RELOAD", "0") == "1"
+ROUTER_RELOAD_INTERVAL = float(os.getenv("ROUTER_RELOAD_INTERVAL", "1.0"))
+
+# bcrypt hashing/verification runs in this many threads, off the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# email -> clinic identity, only consulted for tokens issued without a clinic_id claim
+IDENTITY_CACHE_MAX_ENTRIES = int(os.getenv("IDENTITY_CACHE_MAX_ENTRIES", "10000"))
+IDENTITY_CACHE_TTL_SECONDS = float(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "300"))
+
+# Background ingestion (uploads -> DuckDB)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "200"))  # finished jobs kept for status polling
+
+# Per-conversation agent cache (Backend.utils.tools.bots)
+AGENT_CACHE_MAX_ENTRIES = int(os.getenv("AGENT_CACHE_MAX_ENTRIES", "200"))
+AGENT_CACHE_MAX_MB = int(os.getenv("AGENT_CACHE_MAX_MB", "512"))
+AGENT_CACHE_TTL_SECONDS = float(os.getenv("AGENT_CACHE_TTL_SECONDS", "1800"))  # idle time before eviction
+AGENT_BASE_BYTES = 2 * 1024 * 1024  # rough footprint of executor + LLM client + SQLDatabase
+
+# Schema block injected into the system prompt
+SCHEMA_CACHE_MAX_ENTRIES = int(os.getenv("SCHEMA_CACHE_MAX_ENTRIES", "512"))
+# opt-in: real values from patient tables end up in every system prompt (identifying columns are never sampled)
+SCHEMA_SAMPLE_VALUES = os.getenv("SCHEMA_SAMPLE_VALUES", "0") == "1"  # add a few example values per text column
+
+# Content-addressed store for chart images and speech audio (served by /api/artifacts/{hash})
+ARTIFACTS_DIR = Path(os.getenv("ARTIFACTS_DIR", Path(__file__).resolve().parents[2] / "data" / "artifacts"))
+
+# Results of the agent's SQL queries, keyed on (clinic, normalized SQL, data version)
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", "1024"))
+SQL_CACHE_MAX_MB = int(os.getenv("SQL_CACHE_MAX_MB", "64"))
+
+# sql_query_tool: "direct" = one LLM call writes a validated read-only query that runs on DuckDB
+# (falls back to the SQL agent if it fails to execute); "agent" = always the langchain SQL agent
+SQL_TOOL_MODE = os.getenv("SQL_TOOL_MODE", "direct")
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "200"))  # rows handed back to the model per query
+
+# make_chart: PNGs render in a process pool (0 = inline); CHART_OUTPUT=spec returns a Vega-Lite
+# spec the browser draws instead of a server-rendered image
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", str(min(2, os.cpu_count() or 1))))
+CHART_CACHE_MAX_ENTRIES = int(os.getenv("CHART_CACHE_MAX_ENTRIES", "512"))
+CHART_OUTPUT = os.getenv("CHART_OUTPUT", "png")
+# make_chart(sql=...) aggregates in DuckDB: histogram bins, pie slices before "Other",
+# and the row cap for line (min/max per bucket), scatter (sample) and bar charts
+CHART_HISTOGRAM_BINS = int(os.getenv("CHART_HISTOGRAM_BINS", "30"))
+CHART_PIE_TOP_N = int(os.getenv("CHART_PIE_TOP_N", "8"))
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "2000"))
+
+# sql_query_tool results kept server-side per conversation: the model gets a handle, the schema and
+# a preview; make_chart(handle=...) reads the rows from here. Over the memory budget results spill to Parquet
+RESULT_STORE_MAX_MB = int(os.getenv("RESULT_STORE_MAX_MB", "256"))
+RESULT_INLINE_MAX_ROWS = int(os.getenv("RESULT_INLINE_MAX_ROWS", "50000"))  # larger results go straight to disk
+RESULT_PREVIEW_ROWS = int(os.getenv("RESULT_PREVIEW_ROWS", "50"))
+RESULT_SPILL_DIR = Path(os.getenv("RESULT_SPILL_DIR", Path(__file__).resolve().parents[2] / "data" / "results"))
+RESULT_SPILL_MAX_ENTRIES = int(os.getenv("RESULT_SPILL_MAX_ENTRIES", "2000"))
+
+# Text-to-speech (synthesized in the background, cached by hash of text/voice/model)
+TTS_DIR = Path(__file__).resolve().parents[2] / "data" / "tts"  # <key>.ref -> artifact hash of the audio
+TTS_MODEL = "gpt-4o-mini-tts"
+TTS_FALLBACK_MODEL = "gpt-4o-realtime-preview-2024-12-17"
+TTS_VOICE = "alloy"
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "600"))
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "4"))
+TTS_WAIT_SECONDS = float(os.getenv("TTS_WAIT_SECONDS", "60"))  # how long GET /api/tts/{key} waits for synthesis
+
+# LLM-bound chat requests: beyond the concurrency cap they queue, beyond the queue they get 429
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+
+# GET /metrics (cache, limiter and DuckDB internals): off unless METRICS_TOKEN is set,
+# then callers must send "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 EXPLAIN_PROMPT = (
     "Explain the chart you just returned in 2–3 concise sentences. "
     "State what it shows and 1 notable pattern." 
     "Do not create another image."
 )
+NL2SQL_PROMPT = ("""
+    You translate questions about a clinic's data into a single DuckDB SQL query.
+    - Write exactly one read-only SELECT statement (WITH clauses are allowed).
+    - Use only the tables and columns listed below; quote identifiers that need it.
+    - When filtering text columns, match case-insensitively, e.g. LOWER(TRIM(col)) = LOWER(TRIM('value')).
+    - Give result columns short, readable aliases.
+    - Answer with the SQL only: no explanation, no markdown fences.
+
+    ### DATABASE SCHEMA:
+    """)
 FORBIDDEN_WORDS = [
     "prost", "proasta", "idiot", "idioata", "cretin", "cretina", "nebun",
     "nebuna", "bou", "vacă", "dobitoc", "dobitocă", "tâmpit", "tâmpită",
@@ -30,8 +116,8 @@ MAIN_PROMPT = ("""
     Your job is to answer questions by using the given tools to query the database and create charts from the query results.
 
     ### Available tools:
-    - sql_query_tool(query): Receives a natural language request, transforms it into a SQL query, runs it on the database and returns structured results as a list of rows.
-    - make_chart(data, x, y, chart): Creates a chart from query results received from sql_query_tool. Supported charts: bar, line, pie, scatter, histogram, box.
+    - sql_query_tool(query): Receives a natural language request, transforms it into a SQL query, runs it on the database and returns the executed SQL, a result `handle`, the result schema, the total row_count and a preview of the rows (a list of dicts; `truncated` is true when there are more rows than shown).
+    - make_chart(x, y, chart, handle, sql, data_from_sql_query_tool): Creates a chart from the results of a sql_query_tool query. Pass the `handle` that sql_query_tool returned: the chart is built server-side from the full result. Never copy rows into the call; only if no handle was returned, pass the `sql`, and only if neither was returned, pass the rows as `data_from_sql_query_tool`. Supported charts: bar, line, pie, scatter, histogram, box.
 
     ### Rules of interaction:
     1. When the user asks a question about simple and direct patient information:
@@ -40,7 +126,7 @@ MAIN_PROMPT = ("""
 
     2. When the user asks for a chart or wants to visualize data:
         - First call sql_query_tool with a NATURAL-LANGUAGE request.  
-        - Then call make_chart with the proper arguments (data, x, y, chart type).  
+        - Then call make_chart with the proper arguments (x, y, chart type and the returned handle).  
         - Always tell the user the full returned string so he can see the image.
 
     3. Always explain your result clearly:
@@ -1,26 +1,23 @@
-import os
 import bcrypt
 
 from typing import Optional
 from Backend.core.security import create_clinic_token
+from Backend.core.deps import invalidate_clinic_identity
 from Database.db_register import Clinic
 from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from Backend.utils.templates import static_page_response
 from starlette.responses import HTMLResponse, RedirectResponse
 from Database.db_register import SessionLocal, Clinic
 from sqlalchemy.exc import IntegrityError
-from Backend.core.security import hash_secret
+from Backend.core.security import ahash_secret, averify_secret
 
 COOKIE_NAME = "access_token"
 IS_SECURE = False
 class AuthController:
-    def index(self,):
-        current_dir = os.path.dirname(__file__)
-        project_root = os.path.abspath(os.path.join(current_dir, '..', '..'))  # D:\Work\TechFestAsaADatChatu
-        template_path = os.path.join(project_root, 'Frontend', 'auth.html')
-        print(template_path)
-        with open(template_path, 'r', encoding='utf-8') as file:
-            html_content = file.read()
-        return HTMLResponse(content=html_content, status_code=200)
+    def index(self, request: Request = None):
+        # served from memory, precompressed, revalidated by ETag
+        return static_page_response('auth.html', request)
     
 
     async def login(self, request: Request):
@@ -33,8 +30,16 @@ class AuthController:
         password = form.get('password') or ''
         print(f"id={email}, password={password}")
 
-        if Clinic.authenticate(email, password):
-            token = create_clinic_token(clinic_email = email, clinic_name = Clinic.get_clinic_name(email), plan="standard")
+        # one query for id, name and hash; bcrypt runs in its own pool, off the event loop
+        creds = await run_in_threadpool(Clinic.get_identity, email, with_password_hash=True)
+        if creds and await averify_secret(password, creds[2]):
+            clinic_id, clinic_name, _ = creds
+            token = create_clinic_token(
+                clinic_email = email,
+                clinic_name = clinic_name,
+                clinic_id = clinic_id,
+                plan="standard",
+            )
             resp = RedirectResponse(url="/home/index", status_code=302)
             resp.set_cookie(
                 COOKIE_NAME,
@@ -73,9 +78,9 @@ class AuthController:
             """
 
         # Hash the password before storing
-        pwd_hash = hash_secret(password)
+        pwd_hash = await ahash_secret(password)
 
-        try:
+        def insert_clinic():
             with SessionLocal() as session:
                 clinic = Clinic(
                     clinic_id=Clinic._new_id(),
@@ -86,6 +91,10 @@ class AuthController:
                 session.add(clinic)
                 session.commit()
 
+        try:
+            await run_in_threadpool(insert_clinic)
+            invalidate_clinic_identity(email)
+
         except IntegrityError as e:
             # Optional: make messages smarter using e.orig (psycopg2) to detect constraint
             # For now, show generic duplicate message.
@@ -1,7 +1,7 @@
-import os
 from starlette.responses import HTMLResponse,RedirectResponse
 from fastapi import Request
 from Backend.core.security import get_current_session
+from Backend.utils.templates import render_template
 
 
 class HomeController:
@@ -10,13 +10,7 @@ class HomeController:
         if not session:
             return RedirectResponse(url="/auth/index", status_code=302)
 
-        current_dir = os.path.dirname(__file__)
-        project_root = os.path.abspath(os.path.join(current_dir, '..', '..'))
-        template_path = os.path.join(project_root, 'Frontend', 'home.html')
-        with open(template_path, 'r', encoding='utf-8') as f:
-            html = f.read()
-            
-        html = html.replace("{{clinic_name}}", session.get("clinic_name", "Clinic Name"))
+        html = render_template('home.html', clinic_name=session.get("clinic_name", "Clinic Name"))
         # Optional: prevent caching of protected pages
         resp = HTMLResponse(content=html, status_code=200)
         resp.headers["Cache-Control"] = "no-store"
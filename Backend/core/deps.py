@@ -1,20 +1,75 @@
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from .security import decode_token
+from Backend.config.constants import IDENTITY_CACHE_MAX_ENTRIES, IDENTITY_CACHE_TTL_SECONDS
+from Backend.utils.cache import BoundedCache
 from Database.db_register import Clinic
 _bearer = HTTPBearer(auto_error=True)
 
+# clinic_email -> {"clinic_id", "clinic_name"}; expires from insertion, so a
+# changed clinic is picked up within the TTL even without explicit invalidation
+_identities = BoundedCache(
+    max_entries=IDENTITY_CACHE_MAX_ENTRIES,
+    ttl=IDENTITY_CACHE_TTL_SECONDS,
+    sliding=False,
+)
+
+
+def clinic_identity(clinic_email: str) -> Optional[dict]:
+    """Clinic id and name for an email, from the cache or a single query.
+    Unknown emails are not cached."""
+    identity = _identities.get(clinic_email)
+    if identity is None:
+        row = Clinic.get_identity(clinic_email)
+        if row is None:
+            return None
+        identity = {"clinic_id": row[0], "clinic_name": row[1]}
+        _identities[clinic_email] = identity
+    return identity
+
+
+def invalidate_clinic_identity(clinic_email: Optional[str] = None) -> None:
+    """Forget one email's cached identity (or all of them)."""
+    if clinic_email is None:
+        _identities.clear()
+    else:
+        _identities.pop(clinic_email, None)
+
+
+def identity_cache_stats() -> dict:
+    return _identities.stats()
+
+
+def session_clinic_id(payload: dict) -> Optional[str]:
+    """Clinic id of a decoded token, e.g. the session cookie's."""
+    if payload.get("clinic_id"):
+        return payload["clinic_id"]
+    clinic_email = payload.get("clinic_email")  # tokens issued before clinic_id became a claim
+    identity = clinic_identity(clinic_email) if clinic_email else None
+    return identity["clinic_id"] if identity else None
+
+
 def get_current_clinic(creds: HTTPAuthorizationCredentials = Depends(_bearer)) -> dict:
     try:
         payload = decode_token(creds.credentials)
+        clinic_id = payload.get("clinic_id")
+        if clinic_id:
+            # signed claim: no database round trip
+            return {
+                "clinic_id": clinic_id,
+                "clinic_name": payload.get("clinic_name")
+            }
+        # tokens issued before clinic_id became a claim
         clinic_email = payload.get("clinic_email")
-        clinic_id = Clinic.get_clinic_id_by_email(clinic_email)
         if not clinic_email:
-            raise ValueError("missing clinic_id")
+            raise ValueError("missing clinic_email")
+        identity = clinic_identity(clinic_email)
+        if identity is None:
+            raise ValueError("unknown clinic")
         return {
-            "clinic_id": clinic_id,
-            "clinic_name": payload.get("clinic_name")
+            "clinic_id": identity["clinic_id"],
+            "clinic_name": payload.get("clinic_name") or identity["clinic_name"]
         }
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
-
@@ -0,0 +1,74 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+
+from Backend.config.constants import LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT_SECONDS
+
+
+class LimiterFull(Exception):
+    def __init__(self, waiting: int, retry_after: int):
+        super().__init__(f"{waiting} requests already waiting")
+        self.waiting = waiting
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """Caps concurrent LLM-bound work; excess requests queue (bounded) or are rejected.
+
+    Lives on the event loop: use only from async code.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._sem: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_concurrent)
+        return self._sem
+
+    def full(self) -> bool:
+        return self.active >= self.max_concurrent and self.waiting >= self.max_queue
+
+    @asynccontextmanager
+    async def slot(self, on_queued: Optional[Callable[[int], None]] = None):
+        sem = self._semaphore()
+        if sem.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise LimiterFull(self.waiting, retry_after=int(self.queue_timeout))
+            self.waiting += 1
+            if on_queued:
+                on_queued(self.waiting)  # 1-based position at the time of queueing
+            try:
+                await asyncio.wait_for(sem.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise LimiterFull(self.waiting, retry_after=int(self.queue_timeout))
+            finally:
+                self.waiting -= 1
+        else:
+            await sem.acquire()
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            sem.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+        }
+
+
+llm_limiter = ConcurrencyLimiter(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT_SECONDS)
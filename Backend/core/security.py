@@ -1,12 +1,19 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from jose import jwt, JWTError, ExpiredSignatureError  # <- import exceptions here
 from passlib.context import CryptContext
 from fastapi import Request
 from .config import JWT_SECRET, JWT_ALG, JWT_EXPIRES_MIN
+from Backend.config.constants import PASSWORD_HASH_WORKERS
 
 pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
 COOKIE_NAME = "access_token"
 
+# bcrypt is deliberately slow; a small dedicated pool keeps a burst of logins
+# from stalling the event loop or starving the default threadpool
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
 def get_current_session(request: Request) -> dict | None:
     token = request.cookies.get(COOKIE_NAME)
     if not token:
@@ -32,11 +39,19 @@ def hash_secret(raw: str) -> str:
 def verify_secret(raw: str, hashed: str) -> bool:
     return pwd_ctx.verify(raw, hashed)
 
-def create_clinic_token(*, clinic_email: str, clinic_name: str, plan: str = "standard") -> str:
+async def ahash_secret(raw: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, hash_secret, raw)
+
+async def averify_secret(raw: str, hashed: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, verify_secret, raw, hashed)
+
+def create_clinic_token(*, clinic_email: str, clinic_name: str, plan: str = "standard",
+                        clinic_id: str | None = None) -> str:
     now = datetime.now(timezone.utc)
     payload = {
         "sub": f"clinic:{clinic_email}",
         "clinic_email": clinic_email,
+        "clinic_id": clinic_id,
         "clinic_name": clinic_name,
         "plan": plan,
         "iat": int(now.timestamp()),
@@ -1,4 +1,5 @@
-from typing import List, Literal
+from datetime import datetime
+from typing import List, Literal, Optional
 from pydantic import BaseModel, ConfigDict, Field
 
 class ClinicRegisterRequest(BaseModel):
@@ -25,6 +26,9 @@ class ClinicPrincipal(BaseModel):
 class ConversationOut(BaseModel):
     id: int
     title: str
+    updated_at: Optional[datetime] = None
+    message_count: Optional[int] = None
+    last_activity: Optional[datetime] = None
     model_config = ConfigDict(from_attributes=True)
 
 
@@ -36,9 +40,22 @@ class MessageOut(BaseModel):
     id: int
     role: Literal["user", "assistant"]
     content: str
+    created_at: Optional[datetime] = None
     model_config = ConfigDict(from_attributes=True)
 
 
 class ConversationWithMessages(BaseModel):
     conversation: ConversationOut
     messages: List[MessageOut]
+    next_before: Optional[int] = None  # pass as ?before= to fetch older messages
+
+
+class IngestJobOut(BaseModel):
+    id: str
+    clinic_id: str
+    state: Literal["queued", "running", "done", "failed"]
+    rows_ingested: int = 0
+    version: Optional[int] = None
+    error: Optional[str] = None
+    duration: Optional[float] = None
+    model_config = ConfigDict(from_attributes=True)
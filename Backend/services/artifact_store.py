@@ -0,0 +1,124 @@
+import base64
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from Backend.config.constants import ARTIFACTS_DIR
+
+_HASH = re.compile(r"^[0-9a-f]{64}$")
+_DATA_URI = re.compile(r"data:([\w.+-]+/[\w.+-]+);base64,([A-Za-z0-9+/=\s]+)")
+_ARTIFACT_URL = re.compile(r"^/api/artifacts/([0-9a-f]{64})$")
+_OWNER = re.compile(r"^[\w-]+$")
+
+
+def is_artifact_hash(digest: str) -> bool:
+    return bool(_HASH.match(digest or ""))
+
+
+class LocalArtifactStore:
+    """Content-addressed blobs on the local filesystem.
+
+    Each blob is stored once under its sha256 (ab/cd/<hash>) with its media
+    type in a small sidecar file; writing the same bytes again is a no-op.
+    Identical bytes are shared across clinics, so every clinic allowed to read
+    a blob gets an empty <hash>.owner.<clinic_id> marker next to it.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def _type_path(self, digest: str) -> Path:
+        path = self.path(digest)
+        return path.with_name(path.name + ".type")
+
+    def _owner_path(self, digest: str, owner: str) -> Path:
+        if not _OWNER.match(owner or ""):
+            raise ValueError(f"Invalid artifact owner {owner!r}")
+        path = self.path(digest)
+        return path.with_name(f"{path.name}.owner.{owner}")
+
+    def _write(self, path: Path, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def put(self, data: bytes, media_type: str, owner: Optional[str] = None) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # type first: a visible blob always has its media type
+            self._write(self._type_path(digest), media_type.encode("ascii"))
+            self._write(path, data)
+        if owner is not None:
+            self.grant(digest, owner)
+        return digest
+
+    def grant(self, digest: str, owner: str) -> None:
+        """Record that the owner clinic may read the blob."""
+        self._owner_path(digest, owner).touch()
+
+    def owned_by(self, digest: str, owner: Optional[str]) -> bool:
+        try:
+            return self._owner_path(digest, owner).exists()
+        except ValueError:
+            return False
+
+    def exists(self, digest: str) -> bool:
+        return is_artifact_hash(digest) and self.path(digest).exists()
+
+    def media_type(self, digest: str) -> Optional[str]:
+        try:
+            return self._type_path(digest).read_text("ascii").strip() or None
+        except FileNotFoundError:
+            return None
+
+    def size(self, digest: str) -> int:
+        return self.path(digest).stat().st_size
+
+    def read(self, digest: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        """Bytes [start, end] (inclusive, like HTTP ranges) of the blob."""
+        with open(self.path(digest), "rb") as f:
+            f.seek(start)
+            return f.read() if end is None else f.read(end - start + 1)
+
+
+artifacts = LocalArtifactStore(ARTIFACTS_DIR)
+
+
+def artifact_url(digest: str) -> str:
+    return f"/api/artifacts/{digest}"
+
+
+def artifact_hash_from_url(url: str) -> Optional[str]:
+    m = _ARTIFACT_URL.match((url or "").strip())
+    return m.group(1) if m else None
+
+
+def store_bytes(data: bytes, media_type: str, owner: Optional[str] = None) -> str:
+    """Store data for the owner clinic and return the URL messages should reference it by."""
+    return artifact_url(artifacts.put(data, media_type, owner))
+
+
+def externalize_data_uris(text: str, owner: Optional[str] = None) -> str:
+    """Replace inline base64 data URIs in text with artifact URLs readable by owner."""
+    def _replace(m: re.Match) -> str:
+        try:
+            data = base64.b64decode("".join(m.group(2).split()), validate=True)
+        except ValueError:
+            return m.group(0)
+        return store_bytes(data, m.group(1).lower(), owner)
+
+    return _DATA_URI.sub(_replace, text)
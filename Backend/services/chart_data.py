@@ -0,0 +1,162 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import duckdb
+
+from Backend.config.constants import CHART_HISTOGRAM_BINS, CHART_MAX_POINTS, CHART_PIE_TOP_N
+from Backend.services.nl_sql import as_subquery, validate_read_only
+from Backend.services.result_store import StoredResult, open_result
+from Backend.services.sql_cache import cached_result
+from Database.db import clinic_read_connection
+from Database.sql_utils import jsonable, quote_identifier
+
+# (records, summary): records are rows for the renderer; summary carries
+# pre-aggregated shapes (histogram bins, box statistics) when rows would not fit
+ChartData = Tuple[List[dict], Optional[Dict[str, Any]]]
+
+
+def _histogram_sql(sql: str, x: str, y: str) -> str:
+    bins = CHART_HISTOGRAM_BINS
+    return f"""
+        WITH src AS (
+            SELECT TRY_CAST({quote_identifier(x)} AS DOUBLE) AS v, TRY_CAST({quote_identifier(y)} AS DOUBLE) AS w
+            FROM {as_subquery(sql)} AS _q
+        ),
+        r AS (SELECT min(v) AS lo, max(v) AS hi FROM src WHERE v IS NOT NULL)
+        SELECT r.lo, r.hi,
+               coalesce(least(CAST(floor((v - r.lo) / nullif(r.hi - r.lo, 0) * {bins}) AS INTEGER), {bins - 1}),
+                        {bins // 2}) AS bin,
+               sum(w) AS weight
+        FROM src, r
+        WHERE v IS NOT NULL
+        GROUP BY ALL
+        ORDER BY bin
+    """
+
+
+def _box_sql(sql: str, columns: List[str]) -> str:
+    # Per column: quartiles and Tukey whiskers, as matplotlib draws them
+    # (the most extreme values within 1.5 IQR of the box)
+    casts = ", ".join(f"TRY_CAST({quote_identifier(c)} AS DOUBLE) AS v{i}" for i, c in enumerate(columns))
+    quartiles = ", ".join(f"quantile_cont(v{i}, [0.25, 0.5, 0.75]) AS q{i}" for i in range(len(columns)))
+    stats = ",\n               ".join(
+        f"q{i}[1], q{i}[2], q{i}[3], "
+        f"min(v{i}) FILTER (WHERE v{i} >= q{i}[1] - 1.5 * (q{i}[3] - q{i}[1])), "
+        f"max(v{i}) FILTER (WHERE v{i} <= q{i}[3] + 1.5 * (q{i}[3] - q{i}[1]))"
+        for i in range(len(columns))
+    )
+    return f"""
+        WITH src AS (SELECT {casts} FROM {as_subquery(sql)} AS _q),
+        q AS (SELECT {quartiles} FROM src)
+        SELECT {stats}
+        FROM src, q
+        GROUP BY ALL
+    """
+
+
+def _pie_sql(sql: str, x: str, y: str) -> str:
+    return f"""
+        WITH g AS (SELECT {quote_identifier(x)} AS label, sum({quote_identifier(y)}) AS value FROM {as_subquery(sql)} AS _q GROUP BY 1),
+        r AS (SELECT *, row_number() OVER (ORDER BY value DESC, label) AS rk FROM g)
+        SELECT CASE WHEN rk <= {CHART_PIE_TOP_N} THEN CAST(label AS VARCHAR) ELSE 'Other' END AS {quote_identifier(x)},
+               sum(value) AS {quote_identifier(y)}
+        FROM r
+        GROUP BY 1
+        ORDER BY min(rk)
+    """
+
+
+def _line_sql(sql: str, x: str, y: str) -> str:
+    # Min/max per bucket keeps peaks and troughs; under the threshold every row is its own bucket
+    half = max(CHART_MAX_POINTS // 2, 1)
+    return f"""
+        WITH src AS (
+            SELECT {quote_identifier(x)} AS cx, {quote_identifier(y)} AS cy, row_number() OVER () - 1 AS rn, count(*) OVER () AS total
+            FROM {as_subquery(sql)} AS _q
+        ),
+        b AS (SELECT *, CASE WHEN total <= {CHART_MAX_POINTS} THEN rn ELSE rn * {half} // total END AS bucket FROM src)
+        SELECT cx AS {quote_identifier(x)}, cy AS {quote_identifier(y)}
+        FROM b
+        QUALIFY row_number() OVER (PARTITION BY bucket ORDER BY cy, rn) = 1
+             OR row_number() OVER (PARTITION BY bucket ORDER BY cy DESC, rn) = 1
+        ORDER BY rn
+    """
+
+
+def _scatter_sql(sql: str, x: str, y: str) -> str:
+    return f"""
+        SELECT {quote_identifier(x)}, {quote_identifier(y)} FROM {as_subquery(sql)} AS _q
+        USING SAMPLE reservoir({CHART_MAX_POINTS} ROWS) REPEATABLE (42)
+    """
+
+
+def _rows_sql(sql: str, x: str, y: str) -> str:
+    return f"SELECT {quote_identifier(x)}, {quote_identifier(y)} FROM {as_subquery(sql)} AS _q LIMIT {CHART_MAX_POINTS}"
+
+
+def _run(con, query: str) -> Tuple[List[str], List[tuple]]:
+    """Columns and rows of query on a clinic (SQLAlchemy) or private (duckdb) connection."""
+    if isinstance(con, duckdb.DuckDBPyConnection):
+        cursor = con.execute(query)
+        return [d[0] for d in cursor.description], cursor.fetchall()
+    result = con.exec_driver_sql(query)
+    return list(result.keys()), result.fetchall()
+
+
+def _records(con, query: str) -> List[dict]:
+    columns, rows = _run(con, query)
+    return [dict(zip(columns, (jsonable(v) for v in row))) for row in rows]
+
+
+def _aggregate(con, sql: str, x: str, y: str, chart: str) -> ChartData:
+    if chart == "histogram":
+        _, rows = _run(con, _histogram_sql(sql, x, y))
+        if not rows:
+            return [], None
+        lo, hi = rows[0][0], rows[0][1]
+        if lo == hi:  # same convention as numpy for a zero-width range
+            lo, hi = lo - 0.5, hi + 0.5
+        bins = CHART_HISTOGRAM_BINS
+        weights = [0.0] * bins
+        for _, _, b, w in rows:
+            weights[b] += float(w or 0)
+        edges = [lo + (hi - lo) * i / bins for i in range(bins + 1)]
+        return [], {"histogram": {"edges": edges, "weights": weights}}
+    if chart == "box":
+        columns = list(dict.fromkeys((x, y)))
+        _, rows = _run(con, _box_sql(sql, columns))
+        row = rows[0] if rows else (None,) * (5 * len(columns))
+        stats = []
+        for i, column in enumerate(columns):
+            q1, med, q3, whislo, whishi = row[5 * i:5 * i + 5]
+            if med is not None:  # non-numeric columns have no quartiles
+                stats.append({"label": column, "q1": q1, "med": med, "q3": q3, "whislo": whislo, "whishi": whishi})
+        return [], {"box": stats}
+    if chart == "pie":
+        return _records(con, _pie_sql(sql, x, y)), None
+    if chart == "line":
+        return _records(con, _line_sql(sql, x, y)), None
+    if chart == "scatter":
+        return _records(con, _scatter_sql(sql, x, y)), None
+    return _records(con, _rows_sql(sql, x, y)), None
+
+
+def _compute(clinic_id: str, sql: str, x: str, y: str, chart: str) -> ChartData:
+    with clinic_read_connection(clinic_id) as con:
+        return _aggregate(con, sql, x, y, chart)
+
+
+def chart_data(clinic_id: str, sql: str, x: str, y: str, chart: str, allowed_tables: Iterable[str]) -> ChartData:
+    """Data for a chart of the query's results, aggregated in DuckDB: binned weights
+    for histograms, quartiles for box plots, top-N plus "Other" for pies and at most
+    CHART_MAX_POINTS rows for line/scatter/bar. Cached like the query's own results."""
+    sql = validate_read_only(sql.strip().rstrip(";"), allowed_tables)
+    return cached_result(clinic_id, sql, ("chart", chart, x, y), lambda: _compute(clinic_id, sql, x, y, chart))
+
+
+def chart_data_for_result(result: StoredResult, x: str, y: str, chart: str) -> ChartData:
+    """Same aggregations over a stored result (see result_store), without re-running its query."""
+    def compute() -> ChartData:
+        with open_result(result) as (con, source):
+            return _aggregate(con, source, x, y, chart)
+
+    return cached_result(result.clinic_id, result.sql, ("result", result.handle, chart, x, y), compute)
@@ -0,0 +1,198 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from Backend.config.constants import CHART_CACHE_MAX_ENTRIES, CHART_WORKERS
+from Backend.services.artifact_store import artifact_hash_from_url, artifacts, store_bytes
+from Backend.utils.cache import BoundedCache
+
+SPEC_MEDIA_TYPE = "application/vnd.vegalite.v5+json"
+VEGA_LITE_SCHEMA = "https://vega.github.io/schema/vega-lite/v5.json"
+
+# hash of (data, x, y, chart, output) -> artifact URL of the PNG or spec
+_charts = BoundedCache(max_entries=CHART_CACHE_MAX_ENTRIES)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(max(CHART_WORKERS, 1) * 4)  # renders queued or running
+
+
+def chart_key(records: List[dict], x: str, y: str, chart: str, output: str,
+              summary: Optional[Dict[str, Any]] = None) -> str:
+    payload = json.dumps([records, x, y, chart, output, summary], sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def render_png(records: List[dict], x: str, y: str, chart: str = "bar",
+               summary: Optional[Dict[str, Any]] = None) -> bytes:
+    """Draw the chart on a private Figure/Agg canvas; no pyplot global state is used,
+    so this is safe in any thread or worker process. `summary` holds histogram bins
+    or box statistics already aggregated by the database (see chart_data)."""
+    df = pd.DataFrame(records)
+    fig = Figure(figsize=(6, 4))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+
+    if summary and "histogram" in summary:
+        edges, weights = summary["histogram"]["edges"], summary["histogram"]["weights"]
+        centers = [(lo + hi) / 2 for lo, hi in zip(edges, edges[1:])]
+        ax.hist(centers, bins=edges, weights=weights)
+        ax.set_xlabel(x)
+        ax.set_ylabel(y)
+    elif summary and "box" in summary:
+        ax.bxp(summary["box"], showfliers=False)
+    elif chart == "line":
+        df.plot(x=x, y=y, kind="line", ax=ax)
+    elif chart == "pie":
+        df.set_index(x)[y].plot(kind="pie", ax=ax, autopct="%1.1f%%")
+        ax.set_ylabel("")
+    elif chart == "scatter":
+        df.plot.scatter(x=x, y=y, ax=ax)
+    elif chart == "histogram":
+        ax.hist(df[x], weights=df[y], bins=30)
+        ax.set_xlabel(x)
+        ax.set_ylabel(y)
+    elif chart == "box":
+        df[[x, y]].plot.box(ax=ax)
+    else:
+        df.plot(x=x, y=y, kind="bar", ax=ax)
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=100, bbox_inches="tight")
+    return buf.getvalue()
+
+
+def _field_type(series: pd.Series) -> str:
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return "quantitative"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "temporal"
+    return "nominal"
+
+
+def vega_lite_spec(records: List[dict], x: str, y: str, chart: str = "bar",
+                   summary: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Vega-Lite description of the same chart, for drawing in the browser."""
+    values = json.loads(json.dumps(records, default=str))
+    df = pd.DataFrame(values)
+    x_type = _field_type(df[x]) if x in df else "nominal"
+    spec: Dict[str, Any] = {"$schema": VEGA_LITE_SCHEMA, "data": {"values": values}, "width": 480, "height": 320}
+
+    if summary and "histogram" in summary:
+        edges, weights = summary["histogram"]["edges"], summary["histogram"]["weights"]
+        spec["data"] = {"values": [
+            {"bin_start": lo, "bin_end": hi, y: w} for lo, hi, w in zip(edges, edges[1:], weights)
+        ]}
+        spec["mark"] = "bar"
+        spec["encoding"] = {
+            "x": {"field": "bin_start", "bin": {"binned": True}, "type": "quantitative", "title": x},
+            "x2": {"field": "bin_end"},
+            "y": {"field": y, "type": "quantitative"},
+        }
+    elif summary and "box" in summary:
+        spec["data"] = {"values": summary["box"]}
+        x_enc = {"field": "label", "type": "nominal", "title": None}
+        spec["layer"] = [
+            {"mark": "rule", "encoding": {"x": x_enc, "y": {"field": "whislo", "type": "quantitative", "title": None},
+                                          "y2": {"field": "whishi"}}},
+            {"mark": {"type": "bar", "size": 28}, "encoding": {"x": x_enc, "y": {"field": "q1", "type": "quantitative"},
+                                                                "y2": {"field": "q3"}}},
+            {"mark": {"type": "tick", "color": "white", "size": 28},
+             "encoding": {"x": x_enc, "y": {"field": "med", "type": "quantitative"}}},
+        ]
+    elif chart == "line":
+        spec["mark"] = {"type": "line", "point": True}
+        spec["encoding"] = {"x": {"field": x, "type": x_type}, "y": {"field": y, "type": "quantitative"}}
+    elif chart == "pie":
+        spec["mark"] = {"type": "arc", "tooltip": True}
+        spec["encoding"] = {"theta": {"field": y, "type": "quantitative"}, "color": {"field": x, "type": "nominal"}}
+    elif chart == "scatter":
+        spec["mark"] = {"type": "point", "tooltip": True}
+        spec["encoding"] = {"x": {"field": x, "type": x_type}, "y": {"field": y, "type": "quantitative"}}
+    elif chart == "histogram":
+        spec["mark"] = "bar"
+        spec["encoding"] = {
+            "x": {"field": x, "bin": {"maxbins": 30}, "type": "quantitative"},
+            "y": {"aggregate": "sum", "field": y, "type": "quantitative", "title": y},
+        }
+    elif chart == "box":
+        spec["transform"] = [{"fold": [x, y], "as": ["column", "value"]}]
+        spec["mark"] = "boxplot"
+        spec["encoding"] = {"x": {"field": "column", "type": "nominal"}, "y": {"field": "value", "type": "quantitative"}}
+    else:
+        spec["mark"] = {"type": "bar", "tooltip": True}
+        spec["encoding"] = {"x": {"field": x, "type": "nominal", "sort": None}, "y": {"field": y, "type": "quantitative"}}
+    return spec
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if CHART_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a server process that runs threads can deadlock the child
+            _pool = ProcessPoolExecutor(max_workers=CHART_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _render(records: List[dict], x: str, y: str, chart: str, summary: Optional[Dict[str, Any]]) -> bytes:
+    """Render in the process pool (off the GIL); inline when the pool is disabled or broke."""
+    pool = _get_pool()
+    if pool is None:
+        return render_png(records, x, y, chart, summary)
+    with _pending:
+        try:
+            return pool.submit(render_png, records, x, y, chart, summary).result()
+        except BrokenProcessPool:
+            print("Chart render pool broke; restarting it")
+            _reset_pool(pool)
+            return render_png(records, x, y, chart, summary)
+
+
+def make_chart_artifact(records: List[dict], x: str, y: str, chart: str = "bar", output: str = "png",
+                        summary: Optional[Dict[str, Any]] = None, owner: Optional[str] = None) -> str:
+    """Artifact URL of the chart: a PNG, or with output="spec" a Vega-Lite JSON spec,
+    readable by the owner clinic. Identical requests reuse the stored artifact
+    instead of rendering again."""
+    key = chart_key(records, x, y, chart, output, summary)
+    url = _charts.get(key)
+    digest = artifact_hash_from_url(url) if url is not None else None
+    if digest and artifacts.exists(digest):
+        if owner is not None:
+            artifacts.grant(digest, owner)
+        return url
+    if output == "spec":
+        body = json.dumps(vega_lite_spec(records, x, y, chart, summary), separators=(",", ":")).encode("utf-8")
+        url = store_bytes(body, SPEC_MEDIA_TYPE, owner)
+    else:
+        url = store_bytes(_render(records, x, y, chart, summary), "image/png", owner)
+    _charts[key] = url
+    return url
+
+
+def is_chart_spec_url(s: str) -> bool:
+    digest = artifact_hash_from_url(s)
+    return bool(digest) and artifacts.media_type(digest) == SPEC_MEDIA_TYPE
+
+
+def chart_cache_stats() -> dict:
+    return _charts.stats()
+
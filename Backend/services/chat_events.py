@@ -0,0 +1,56 @@
+from typing import Any, Callable, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from Backend.utils.tools import is_chart_spec, is_image
+
+Emit = Callable[[str, Dict[str, Any]], None]
+
+_PREVIEW_CHARS = 500
+
+
+def _preview(value: Any) -> str:
+    text = str(value)
+    return text if len(text) <= _PREVIEW_CHARS else text[:_PREVIEW_CHARS] + "…"
+
+
+class ChatEventHandler(BaseCallbackHandler):
+    """Turns agent callbacks into chat events (tool start/finish, SQL, tokens, chart).
+
+    Tokens are only forwarded for the outer agent: while a tool runs (e.g. the
+    nested SQL agent) its LLM output is internal and is not streamed.
+    """
+
+    def __init__(self, emit: Emit):
+        self.emit = emit
+        self._tools: Dict[UUID, str] = {}
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID,
+                      parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._tools[run_id] = name
+        if name == "sql_db_query":
+            self.emit("sql", {"query": input_str})
+        self.emit("tool_start", {"tool": name, "input": _preview(input_str)})
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        name = self._tools.pop(run_id, "tool")
+        if name == "sql_query_tool" and isinstance(output, dict) and output.get("sql"):
+            self.emit("sql", {"query": output["sql"]})  # direct mode: the query ran without a nested agent
+        if name == "make_chart" and isinstance(output, str) and is_image(output):
+            self.emit("chart", {"src": "".join(output.split())})
+            self.emit("tool_end", {"tool": name})
+        elif name == "make_chart" and isinstance(output, str) and is_chart_spec(output):
+            self.emit("chart", {"spec": "".join(output.split())})
+            self.emit("tool_end", {"tool": name})
+        else:
+            self.emit("tool_end", {"tool": name, "output": _preview(getattr(output, "content", output))})
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        name = self._tools.pop(run_id, "tool")
+        self.emit("tool_end", {"tool": name, "error": str(error)})
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if token and not self._tools:
+            self.emit("token", {"text": token})
@@ -1,21 +1,95 @@
+import re
+from typing import Optional
 from langchain.agents import create_openai_tools_agent, AgentExecutor
 from langchain.memory import ConversationBufferMemory
 from Backend.config.classes import ModelConfig
-from Backend.config.constants import MAIN_PROMPT
+from Backend.config.constants import MAIN_PROMPT, MODEL_CONFIG, AGENT_BASE_BYTES
 from Backend.services.openai_service import build_prompt, build_llm
-from Backend.utils.tools import build_sql_tool, make_chart
+from Backend.services.schema_service import describe_clinic_schema, clinic_data_version
+from Backend.utils.tools import build_chart_tool, build_sql_tool, bots
 from Backend.utils.validators import language_filter
+from Database.db_history import list_messages
+
+_MEDIA = re.compile(r"<(img|audio|chart)\b[^>]*>[\s\S]*?</\1>", re.IGNORECASE)
+
+
+class ChatAgent:
+    """Callable wrapper around a conversation's AgentExecutor and its memory."""
+
+    def __init__(self, executor: Optional[AgentExecutor] = None,
+                 memory: Optional[ConversationBufferMemory] = None,
+                 error: Optional[Exception] = None, data_version: int = 0):
+        self.executor = executor
+        self.memory = memory
+        self.error = error
+        self.data_version = data_version  # clinic data the prompt's schema was built from
+
+    def _precheck(self, query: str) -> Optional[str]:
+        """Canned reply when the query must not reach the LLM, else None."""
+        if self.error is not None:
+            return f"Error appeared at factory level: {self.error}."
+        if not query or not query.strip():
+            raise ValueError(
+                "Providing an empty input is not supported.")
+        if language_filter(query):
+            return "Please use a respectful language."
+        return None
+
+    def __call__(self, query: str, callbacks: Optional[list] = None) -> str:
+        try:
+            canned = self._precheck(query)
+            if canned is not None:
+                return canned
+            otp = self.executor.invoke({"input": query.strip()}, config={"callbacks": callbacks} if callbacks else None)
+            return otp["output"].strip()
+
+        except Exception as chatError:
+            return f"Error appeared at conversation level: {chatError}."
+
+    async def ainvoke(self, query: str, callbacks: Optional[list] = None) -> str:
+        """Async twin of __call__: the LLM round trips do not hold a worker thread."""
+        try:
+            canned = self._precheck(query)
+            if canned is not None:
+                return canned
+            otp = await self.executor.ainvoke({"input": query.strip()}, config={"callbacks": callbacks} if callbacks else None)
+            return otp["output"].strip()
+
+        except Exception as chatError:
+            return f"Error appeared at conversation level: {chatError}."
+
+    def approx_size(self) -> int:
+        if self.memory is None:
+            return AGENT_BASE_BYTES
+        return AGENT_BASE_BYTES + sum(
+            len(str(m.content)) for m in self.memory.chat_memory.messages
+        )
+
+
+def _restore_history(memory: ConversationBufferMemory, history: list[dict]) -> None:
+    # Media payloads are stripped: the model only needs the text of past turns.
+    for m in history:
+        text = _MEDIA.sub("", m.get("content") or "").strip()
+        if not text:
+            continue
+        if m.get("role") == "user":
+            memory.chat_memory.add_user_message(text)
+        else:
+            memory.chat_memory.add_ai_message(text)
 
 
 def create_agent(
     model: ModelConfig,
-    clinic_code: str
-):
+    clinic_code: str,
+    history: Optional[list[dict]] = None,
+    conversation_id: Optional[int] = None
+) -> ChatAgent:
     try:
+        data_version = clinic_data_version(clinic_code)
         llm = build_llm(model)
-        sql_tool = build_sql_tool(llm, clinic_code)
-        schema = sql_tool("What tables are there? And what are their schemas?")["output"]
-        tools = [sql_tool, make_chart] # Add tools if needed
+        sql_tool = build_sql_tool(llm, clinic_code, conversation_id=conversation_id)
+        schema = describe_clinic_schema(clinic_code)
+        tools = [sql_tool, build_chart_tool(clinic_code, conversation_id=conversation_id)] # Add tools if needed
 
         final_prompt = f"{MAIN_PROMPT}\n{schema}\n"
         prompt_template = build_prompt(final_prompt)
@@ -30,6 +104,7 @@ def create_agent(
             memory_key="chat_history",
             return_messages=True
         )
+        _restore_history(memory, history or [])
 
         executor = AgentExecutor(
             agent=agent,
@@ -37,26 +112,19 @@ def create_agent(
             memory=memory,
             verbose = True
         )
+        return ChatAgent(executor=executor, memory=memory, data_version=data_version)
 
-        def chat_with_agent(query: str) -> str:
-            try:
-                if not query or not query.strip():
-                    raise ValueError(
-                        "Providing an empty input is not supported.")
-
-                if language_filter(query):
-                    return "Please use a respectful language."
-
-                inp = query.strip()
-                otp = executor.invoke({"input": inp})
-                return otp["output"].strip()
-
-            except Exception as chatError:
-                return f"Error appeared at conversation level: {chatError}."
+    except Exception as factoryError:
+        return ChatAgent(error=factoryError)
 
-        return chat_with_agent
 
-    except Exception as factoryError:
-        def dead_chatbot(_: str, err=factoryError):
-            return f"Error appeared at factory level: {err}."
-        return dead_chatbot
+def get_agent(conversation_id: int, clinic_code: str) -> ChatAgent:
+    """Cached agent for a conversation, rebuilt from its stored messages on a miss
+    or when the clinic's data changed since the agent's schema prompt was built."""
+    agent = bots.get(conversation_id)
+    if agent is None or agent.data_version != clinic_data_version(clinic_code):
+        agent = create_agent(MODEL_CONFIG, clinic_code, history=list_messages(conversation_id),
+                             conversation_id=conversation_id)
+        if agent.error is None:  # let broken agents be retried on the next message
+            bots[conversation_id] = agent
+    return agent
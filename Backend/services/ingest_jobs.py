@@ -0,0 +1,107 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Literal, Optional
+
+from Backend.config.constants import INGEST_WORKERS, INGEST_JOB_HISTORY
+from Backend.services.schema_service import invalidate_schema
+from Backend.services.sql_cache import invalidate_sql_results
+
+JobState = Literal["queued", "running", "done", "failed"]
+
+
+@dataclass
+class IngestJob:
+    id: str
+    clinic_id: str
+    state: JobState = "queued"
+    rows_ingested: int = 0
+    version: Optional[int] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+_lock = threading.Lock()
+_jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+_queued_by_clinic: dict[str, str] = {}  # clinic_id -> id of a job that has not started yet
+
+
+def _trim_history() -> None:
+    finished = [j.id for j in _jobs.values() if j.state in ("done", "failed")]
+    for job_id in finished[:max(0, len(finished) - INGEST_JOB_HISTORY)]:
+        _jobs.pop(job_id, None)
+
+
+def _run(job: IngestJob) -> None:
+    from Database.firebaseIngest import ingest_clinic_from_firebase
+
+    with _lock:
+        if _queued_by_clinic.get(job.clinic_id) == job.id:
+            del _queued_by_clinic[job.clinic_id]
+        job.state = "running"
+        job.started_at = time.time()
+    try:
+        summary = ingest_clinic_from_firebase(job.clinic_id)
+        if summary.changed or summary.views_rebuilt:
+            invalidate_schema(job.clinic_id)
+            invalidate_sql_results(job.clinic_id)
+        job.rows_ingested = summary.rows
+        job.version = summary.version
+        job.state = "done"
+    except Exception as e:
+        print(f"Ingest job {job.id} for clinic '{job.clinic_id}' failed: {e}")
+        job.error = str(e)
+        job.state = "failed"
+    finally:
+        with _lock:
+            job.finished_at = time.time()
+            _trim_history()
+
+
+def enqueue_ingest(clinic_id: str) -> IngestJob:
+    """Queue an ingestion for the clinic, reusing a job that has not started yet."""
+    with _lock:
+        pending = _queued_by_clinic.get(clinic_id)
+        if pending and pending in _jobs:
+            return _jobs[pending]
+        job = IngestJob(id=uuid.uuid4().hex, clinic_id=clinic_id)
+        _jobs[job.id] = job
+        _queued_by_clinic[clinic_id] = job.id
+    _executor.submit(_run, job)
+    return job
+
+
+def ensure_ingested(clinic_id: str) -> Optional[IngestJob]:
+    """Queue a first ingestion for clinics whose bucket folder has never been listed.
+    Already-ingested clinics get their views rebuilt from cached Parquet if the
+    database file lost them."""
+    from Database.firebaseIngest import ensure_clinic_views, has_been_listed
+
+    if has_been_listed(clinic_id):
+        if ensure_clinic_views(clinic_id):  # cached schema/results may describe the empty catalog
+            invalidate_schema(clinic_id)
+            invalidate_sql_results(clinic_id)
+        return None
+    return enqueue_ingest(clinic_id)
+
+
+def get_job(job_id: str) -> Optional[IngestJob]:
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def list_jobs(clinic_id: str) -> List[IngestJob]:
+    with _lock:
+        return [j for j in reversed(_jobs.values()) if j.clinic_id == clinic_id]
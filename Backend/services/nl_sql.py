@@ -0,0 +1,98 @@
+import asyncio
+import json
+import re
+import threading
+from typing import Any, Dict, Iterable, List
+
+import duckdb
+
+from Backend.config.constants import NL2SQL_PROMPT, SQL_MAX_ROWS
+from Backend.services.schema_service import describe_clinic_schema
+from Backend.services.sql_cache import cached_result
+from Database.db import clinic_read_connection
+from Database.sql_utils import jsonable
+
+_FENCE = re.compile(r"^```(?:sql)?\s*|\s*```$", re.IGNORECASE)
+
+# Parses and binds candidate queries without touching the clinic database or
+# the file system (table functions such as read_csv fail here instead of running).
+_validator = duckdb.connect(":memory:", config={"enable_external_access": False})
+_validator_lock = threading.Lock()
+
+
+class UnsafeSQL(ValueError):
+    """Generated SQL is not a single read-only query over the clinic's tables."""
+
+
+def _strip_fences(text: str) -> str:
+    return _FENCE.sub("", text.strip()).strip().rstrip(";").strip()
+
+
+def sql_prompt(clinic_id: str, question: str) -> list:
+    return [
+        ("system", f"{NL2SQL_PROMPT}\n{describe_clinic_schema(clinic_id)}\n"),
+        ("human", question),
+    ]
+
+
+def generate_sql(llm, clinic_id: str, question: str) -> str:
+    """One LLM round trip: question -> SQL text."""
+    return _strip_fences(llm.bind(temperature=0).invoke(sql_prompt(clinic_id, question)).content)
+
+
+async def agenerate_sql(llm, clinic_id: str, question: str) -> str:
+    message = await llm.bind(temperature=0).ainvoke(sql_prompt(clinic_id, question))
+    return _strip_fences(message.content)
+
+
+def validate_read_only(sql: str, allowed_tables: Iterable[str]) -> str:
+    """Return sql if it is one SELECT reading only allowed_tables, else raise UnsafeSQL."""
+    allowed = {t.lower() for t in allowed_tables}
+    with _validator_lock:
+        try:
+            statements = duckdb.extract_statements(sql)
+            if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+                raise UnsafeSQL("expected a single SELECT statement")
+            # only plain SELECTs serialize; PRAGMA/SHOW and friends report an error
+            tree = _validator.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0]
+            if json.loads(tree).get("error"):
+                raise UnsafeSQL("expected a single SELECT statement")
+            if '"TABLE_FUNCTION"' in tree:
+                raise UnsafeSQL("table functions are not allowed")
+            tables = duckdb.get_table_names(sql, connection=_validator)
+        except UnsafeSQL:
+            raise
+        except duckdb.Error as e:
+            raise UnsafeSQL(str(e)) from e
+    unknown = sorted(t for t in tables if t.lower().split(".")[-1] not in allowed)
+    if unknown:
+        raise UnsafeSQL(f"unknown tables: {', '.join(unknown)}")
+    return sql
+
+
+def as_subquery(sql: str) -> str:
+    """sql as a parenthesized derived table. The query goes on its own lines, so a
+    trailing -- comment (valid on its own) cannot swallow the closing paren."""
+    return f"(\n{sql}\n)"
+
+
+def execute_sql(clinic_id: str, sql: str, max_rows: int = SQL_MAX_ROWS) -> Dict[str, Any]:
+    """Run a validated query on the clinic's database and return
+    {"columns", "rows" (list of dicts), "truncated"}."""
+    with clinic_read_connection(clinic_id) as con:
+        result = con.exec_driver_sql(sql)
+        columns = list(result.keys())
+        fetched = result.fetchmany(max_rows + 1)
+    rows = [dict(zip(columns, (jsonable(v) for v in row))) for row in fetched[:max_rows]]
+    return {"columns": columns, "rows": rows, "truncated": len(fetched) > max_rows}
+
+
+def run_query(clinic_id: str, sql: str, allowed_tables: Iterable[str]) -> Dict[str, Any]:
+    """Validate, then execute (through the per-clinic result cache)."""
+    validate_read_only(sql, allowed_tables)
+    result = cached_result(clinic_id, sql, ("rows", SQL_MAX_ROWS), lambda: execute_sql(clinic_id, sql))
+    return {"sql": sql, **result}
+
+
+async def arun_query(clinic_id: str, sql: str, allowed_tables: List[str]) -> Dict[str, Any]:
+    return await asyncio.to_thread(run_query, clinic_id, sql, allowed_tables)
@@ -24,5 +24,6 @@ def build_llm(model_config: ModelConfig) -> ChatOpenAI:
         frequency_penalty=model_config.frequency_penalty,
         api_key=model_config.api_key,
         timeout=210.0,  # Set a timeout to avoid long waits
+        streaming=True,  # lets callbacks see tokens as they arrive; invoke() still returns the full message
         max_retries=3  # Retry up to max_retries times in case of errors
     )
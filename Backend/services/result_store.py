@@ -0,0 +1,199 @@
+import atexit
+import os
+import shutil
+import sys
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import duckdb
+import pandas as pd
+
+from Backend.config.constants import (
+    RESULT_INLINE_MAX_ROWS, RESULT_PREVIEW_ROWS, RESULT_SPILL_DIR, RESULT_SPILL_MAX_ENTRIES, RESULT_STORE_MAX_MB,
+)
+from Backend.services.nl_sql import as_subquery
+from Backend.services.sql_cache import cached_result
+from Backend.utils.cache import BoundedCache
+from Database.db import clinic_read_connection
+from Database.sql_utils import jsonable, quote_identifier, quote_literal
+
+# this process's spill files; other workers sharing RESULT_SPILL_DIR keep theirs
+_spill_root = RESULT_SPILL_DIR / str(os.getpid())
+atexit.register(shutil.rmtree, _spill_root, True)
+
+
+@dataclass
+class StoredResult:
+    """A query's full result set, kept server-side and referred to by handle."""
+    handle: str
+    conversation_id: int
+    clinic_id: str
+    sql: str
+    schema: Dict[str, str]  # column -> DuckDB type
+    row_count: int
+    preview: List[dict]
+    rows: Optional[List[tuple]] = None  # in memory
+    path: Optional[Path] = None  # or spilled to Parquet
+    size: int = 0
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.schema)
+
+    def describe(self) -> Dict[str, Any]:
+        """What the model sees: the handle, the schema and a few rows."""
+        return {
+            "sql": self.sql,
+            "handle": self.handle,
+            "schema": self.schema,
+            "row_count": self.row_count,
+            "rows": self.preview,
+            "truncated": self.row_count > len(self.preview),
+        }
+
+
+def _spill_path(conversation_id: int, handle: str) -> Path:
+    return _spill_root / str(conversation_id) / f"{handle}.parquet"
+
+
+def _spill(key: Tuple[int, str], result: StoredResult) -> None:
+    """Evicted from memory: write the rows to Parquet and keep only the path."""
+    path = _spill_path(result.conversation_id, result.handle)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with duckdb.connect() as con:
+        con.register("stored_result", pd.DataFrame.from_records(result.rows, columns=result.columns))
+        con.execute(f"COPY stored_result TO {quote_literal(str(path))} (FORMAT parquet, COMPRESSION zstd)")
+    _spilled[key] = replace(result, rows=None, path=path, size=0)
+
+
+def _delete_spill(key: Tuple[int, str], result: StoredResult) -> None:
+    if result.path is not None:
+        result.path.unlink(missing_ok=True)
+
+
+# (conversation_id, handle) -> StoredResult; memory-bounded, overflow spills to disk
+_in_memory = BoundedCache(max_bytes=RESULT_STORE_MAX_MB * 1024 * 1024, sizeof=lambda r: r.size, on_evict=_spill)
+_spilled = BoundedCache(max_entries=RESULT_SPILL_MAX_ENTRIES, on_evict=_delete_spill)
+
+
+def _approx_size(rows: List[tuple]) -> int:
+    return sys.getsizeof(rows) + sum(sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row) for row in rows)
+
+
+@dataclass(frozen=True)
+class _Execution:
+    """One run of a query, shared through the SQL result cache by every handle
+    (in any conversation) that asks for the same SQL on the same data version."""
+    schema: Dict[str, str]
+    row_count: int
+    preview: List[dict]
+    rows: Optional[List[tuple]] = None  # small results, in memory
+    path: Optional[Path] = None  # large ones: the Parquet file of the handle that ran the query
+    size: int = 0
+
+    def approx_size(self) -> int:
+        return self.size + _approx_size(self.preview)
+
+    def usable(self) -> bool:
+        return self.path is None or self.path.exists()
+
+
+def _typed_select(path: Path, schema: Dict[str, str]) -> str:
+    """Rows of a result file with the query's own types (Parquet stores e.g. HUGEINT as DOUBLE)."""
+    columns = ", ".join(f"CAST({quote_identifier(c)} AS {t}) AS {quote_identifier(c)}" for c, t in schema.items())
+    return f"SELECT {columns} FROM read_parquet({quote_literal(str(path))})"
+
+
+def _execute(clinic_id: str, sql: str, path: Path) -> _Execution:
+    """Run the query once, straight into Parquet at path, so the preview and the
+    stored rows come from the same run. Results up to RESULT_INLINE_MAX_ROWS rows
+    are read back into memory and the file is removed."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with clinic_read_connection(clinic_id) as con:
+            schema = {name: dtype for name, dtype, *_ in con.exec_driver_sql(f"DESCRIBE {sql}").fetchall()}
+            row_count = con.exec_driver_sql(
+                f"COPY {as_subquery(sql)} TO {quote_literal(str(path))} (FORMAT parquet, COMPRESSION zstd)"
+            ).scalar()
+        with duckdb.connect() as local:
+            source = _typed_select(path, schema)
+            if row_count > RESULT_INLINE_MAX_ROWS:
+                first = local.execute(f"{source} LIMIT {RESULT_PREVIEW_ROWS}").fetchall()
+                return _Execution(schema, row_count, _preview(schema, first), path=path)
+            rows = local.execute(source).fetchall()
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    path.unlink()
+    return _Execution(schema, row_count, _preview(schema, rows), rows=rows, size=_approx_size(rows))
+
+
+def _preview(schema: Dict[str, str], rows: List[tuple]) -> List[dict]:
+    return [dict(zip(schema, (jsonable(v) for v in row))) for row in rows[:RESULT_PREVIEW_ROWS]]
+
+
+def _link(source: Path, target: Path) -> None:
+    """Give target its own name for source's file (no copy), so either can be deleted alone."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+    except FileNotFoundError:
+        raise
+    except OSError:  # e.g. a file system without hard links
+        shutil.copyfile(source, target)
+
+
+def store_query(conversation_id: int, clinic_id: str, sql: str) -> StoredResult:
+    """Run a validated query on the clinic's database (or reuse the cached run of the
+    same SQL) and keep its full result under a new handle.
+
+    Results up to RESULT_INLINE_MAX_ROWS rows are held in memory; larger ones stay
+    in the Parquet file the query was copied to.
+    """
+    handle = f"r_{uuid.uuid4().hex[:10]}"
+    path = _spill_path(conversation_id, handle)
+    run = cached_result(clinic_id, sql, ("stored", RESULT_INLINE_MAX_ROWS),
+                        lambda: _execute(clinic_id, sql, path), valid=_Execution.usable)
+    if run.path is not None and run.path != path:
+        try:
+            _link(run.path, path)  # ran for another handle; that one may be dropped before this one
+        except FileNotFoundError:  # deleted since the cache check
+            run = _execute(clinic_id, sql, path)
+
+    result = StoredResult(handle, conversation_id, clinic_id, sql, run.schema, run.row_count, run.preview,
+                          rows=run.rows, path=path if run.path is not None else None, size=run.size)
+    (_spilled if result.path is not None else _in_memory)[(conversation_id, handle)] = result
+    return result
+
+
+def get_result(conversation_id: int, handle: str) -> Optional[StoredResult]:
+    key = (conversation_id, (handle or "").strip())
+    return _in_memory.get(key) or _spilled.get(key)
+
+
+@contextmanager
+def open_result(result: StoredResult) -> Iterator[Tuple[duckdb.DuckDBPyConnection, str]]:
+    """A private DuckDB connection and a SELECT over the stored rows, for tools
+    that aggregate a result (e.g. charts) without going back to the clinic database."""
+    con = duckdb.connect()
+    try:
+        if result.path is not None:
+            yield con, f"SELECT * FROM read_parquet({quote_literal(str(result.path))})"
+        else:
+            con.register("stored_result", pd.DataFrame.from_records(result.rows, columns=result.columns))
+            yield con, "SELECT * FROM stored_result"
+    finally:
+        con.close()
+
+
+def drop_conversation_results(conversation_id: int) -> None:
+    _in_memory.invalidate(lambda key: key[0] == conversation_id)
+    _spilled.invalidate(lambda key: key[0] == conversation_id)
+    shutil.rmtree(_spill_root / str(conversation_id), ignore_errors=True)
+
+
+def result_store_stats() -> dict:
+    return {"memory": _in_memory.stats(), "spilled": _spilled.stats()}
@@ -0,0 +1,102 @@
+import re
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from Backend.config.constants import SCHEMA_CACHE_MAX_ENTRIES, SCHEMA_SAMPLE_VALUES
+from Backend.utils.cache import BoundedCache
+from Database.db import clinic_read_connection
+from Database.sql_utils import quote_identifier
+
+# (clinic_id, data_version, with_samples) -> rendered prompt block
+_schema_cache = BoundedCache(max_entries=SCHEMA_CACHE_MAX_ENTRIES)
+
+_SAMPLE_ROWS = 1000   # rows scanned per table when collecting sample values
+_SAMPLES_PER_COLUMN = 3
+# columns that (may) identify a patient are never sampled, only described
+_IDENTIFYING = re.compile(
+    r"name|e_?mail|phone|mobile|address|street|zip|postal|ssn|cnp|passport|birth|dob|doctor|physician|"
+    r"insurance|policy|patient|(^|_)id($|_)",
+    re.IGNORECASE,
+)
+
+
+def clinic_data_version(clinic_id: str) -> int:
+    """Current ingestion version of the clinic (see Database.firebaseIngest manifests)."""
+    from Database.firebaseIngest import get_data_version
+    return get_data_version(clinic_id)
+
+
+def clinic_tables(clinic_id: str) -> List[str]:
+    """Names of the clinic's tables, read from its own DuckDB catalog."""
+    with clinic_read_connection(clinic_id) as con:
+        rows = con.exec_driver_sql(
+            "SELECT table_name FROM information_schema.tables "
+            "WHERE table_schema = 'main' ORDER BY table_name"
+        ).fetchall()
+    return [t for (t,) in rows]
+
+
+def _read_columns(con) -> "OrderedDict[str, List[Tuple[str, str]]]":
+    rows = con.exec_driver_sql(
+        "SELECT table_name, column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = 'main' ORDER BY table_name, ordinal_position"
+    ).fetchall()
+    tables: "OrderedDict[str, List[Tuple[str, str]]]" = OrderedDict()
+    for table, column, dtype in rows:
+        tables.setdefault(table, []).append((column, dtype))
+    return tables
+
+
+def _read_samples(con, table: str, columns: List[Tuple[str, str]]) -> Dict[str, list]:
+    text_cols = [c for c, dtype in columns if dtype == "VARCHAR" and not _IDENTIFYING.search(c)]
+    if not text_cols:
+        return {}
+    select = ", ".join(
+        f"list_slice(list(DISTINCT {quote_identifier(c)} ORDER BY {quote_identifier(c)}), 1, {_SAMPLES_PER_COLUMN})"
+        for c in text_cols
+    )
+    row = con.exec_driver_sql(
+        f"SELECT {select} FROM (SELECT * FROM {quote_identifier(table)} LIMIT {_SAMPLE_ROWS})"
+    ).fetchone()
+    return dict(zip(text_cols, row or []))
+
+
+def _render(tables, samples: Dict[str, Dict[str, list]]) -> str:
+    if not tables:
+        return "(no tables uploaded yet)"
+    lines = []
+    for table, columns in tables.items():
+        cols = []
+        for column, dtype in columns:
+            values = samples.get(table, {}).get(column)
+            example = f" e.g. {', '.join(repr(v) for v in values)}" if values else ""
+            cols.append(f"  - {column} {dtype}{example}")
+        lines.append(f"TABLE {table}\n" + "\n".join(cols))
+    return "\n".join(lines)
+
+
+def describe_clinic_schema(clinic_id: str, with_samples: bool = SCHEMA_SAMPLE_VALUES) -> str:
+    """Compact, deterministic description of the clinic's tables for the system prompt.
+
+    Cached per clinic and data version, so it is rebuilt only after ingestion
+    changed that clinic's tables.
+    """
+    key = (clinic_id, clinic_data_version(clinic_id), with_samples)
+    cached = _schema_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with clinic_read_connection(clinic_id) as con:
+        tables = _read_columns(con)
+        samples = {t: _read_samples(con, t, cols) for t, cols in tables.items()} if with_samples else {}
+    block = _render(tables, samples)
+    _schema_cache[key] = block
+    return block
+
+
+def invalidate_schema(clinic_id: str) -> int:
+    return _schema_cache.invalidate(lambda key: key[0] == clinic_id)
+
+
+def schema_cache_stats() -> dict:
+    return _schema_cache.stats()
@@ -0,0 +1,104 @@
+import re
+import sys
+from typing import Any, Callable, Hashable, Optional
+
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import text
+
+from Backend.config.constants import SQL_CACHE_MAX_ENTRIES, SQL_CACHE_MAX_MB
+from Backend.services.schema_service import clinic_data_version
+from Backend.utils.cache import BoundedCache
+from Database.db import clinic_read_connection
+
+# (clinic_id, data_version, normalized sql, result kind) -> query result
+_results = BoundedCache(
+    max_entries=SQL_CACHE_MAX_ENTRIES,
+    max_bytes=SQL_CACHE_MAX_MB * 1024 * 1024,
+    sizeof=lambda value: (
+        value.approx_size() if hasattr(value, "approx_size")
+        else sys.getsizeof(value) if isinstance(value, str) else sys.getsizeof(repr(value))
+    ),
+)
+
+# string literals, quoted identifiers, or runs of anything else
+_TOKENS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|[^'\"]+")
+_READ_ONLY = re.compile(r"^\s*(select|with|from)\b", re.IGNORECASE)
+
+
+def normalize_sql(sql: str) -> str:
+    """Canonical text for cache keys: whitespace collapsed, unquoted text
+    lower-cased, trailing semicolons dropped. Quoted parts are kept verbatim."""
+    out = []
+    for token in _TOKENS.findall(sql.strip().rstrip(";").strip()):
+        if token[0] in "'\"":
+            out.append(token)
+        else:
+            out.append(re.sub(r"\s+", " ", token).lower())
+    return "".join(out)
+
+
+def cached_result(clinic_id: str, sql: str, kind: Hashable, compute: Callable[[], Any],
+                  valid: Optional[Callable[[Any], bool]] = None) -> Any:
+    """Result of compute() for this clinic/query, reused until the clinic's data
+    version changes. `kind` separates result shapes of the same query; `valid`
+    rejects cached values that refer to something gone since (e.g. a file)."""
+    key = (clinic_id, clinic_data_version(clinic_id), normalize_sql(sql), kind)
+    cached = _results.get(key)
+    if cached is None or (valid is not None and not valid(cached)):
+        cached = compute()
+        _results[key] = cached
+    return cached
+
+
+def _cacheable(command: Any, fetch: str) -> bool:
+    return isinstance(command, str) and fetch in ("all", "one") and bool(_READ_ONLY.match(command))
+
+
+class CachedSQLDatabase(SQLDatabase):
+    """SQLDatabase for the SQL agent: only single SELECTs over the clinic's tables
+    are run, on a rollback-only connection, and their results are cached per
+    clinic and data version."""
+
+    def __init__(self, *args: Any, clinic_id: str, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.clinic_id = clinic_id
+
+    def run(self, command, fetch="all", include_columns=False, *, parameters=None, execution_options=None):
+        if isinstance(command, str):
+            from Backend.services.nl_sql import validate_read_only  # nl_sql imports this module
+            validate_read_only(command, self.get_usable_table_names())
+        if parameters or execution_options or not _cacheable(command, fetch):
+            return super().run(command, fetch, include_columns,
+                               parameters=parameters, execution_options=execution_options)
+        return cached_result(self.clinic_id, command, ("run", fetch, include_columns),
+                             lambda: super(CachedSQLDatabase, self).run(command, fetch, include_columns))
+
+    def run_no_throw(self, command, *args: Any, **kwargs: Any):
+        from Backend.services.nl_sql import UnsafeSQL
+        try:
+            return super().run_no_throw(command, *args, **kwargs)
+        except UnsafeSQL as e:  # returned like SQL errors, so the agent can rewrite the query
+            return f"Error: query refused: {e}"
+
+    def _execute(self, command, fetch="all", *, parameters=None, execution_options=None):
+        # replaces SQLDatabase._execute, which runs inside engine.begin() and commits
+        if fetch not in ("all", "one"):
+            raise ValueError("Fetch parameter must be either 'one' or 'all'")
+        if isinstance(command, str):
+            command = text(command)
+        with clinic_read_connection(self.clinic_id) as con:
+            cursor = con.execute(command, parameters or {}, execution_options=execution_options or {})
+            if not cursor.returns_rows:
+                return []
+            if fetch == "all":
+                return [row._asdict() for row in cursor.fetchall()]
+            row = cursor.fetchone()
+            return [] if row is None else [row._asdict()]
+
+
+def invalidate_sql_results(clinic_id: str) -> int:
+    return _results.invalidate(lambda key: key[0] == clinic_id)
+
+
+def sql_cache_stats() -> dict:
+    return _results.stats()
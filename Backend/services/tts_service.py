@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+from openai import OpenAI
+
+from Backend.config.constants import (
+    TTS_DIR, TTS_MODEL, TTS_FALLBACK_MODEL, TTS_VOICE, TTS_CHUNK_CHARS, TTS_WORKERS
+)
+from Backend.services.artifact_store import artifacts
+
+TTS_DIR.mkdir(parents=True, exist_ok=True)
+
+_KEY = re.compile(r"^[0-9a-f]{64}$")
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+# Jobs and chunks use separate pools so a job waiting on its chunks can never starve them.
+_jobs = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts-job")
+_chunks = ThreadPoolExecutor(max_workers=TTS_WORKERS * 2, thread_name_prefix="tts-chunk")
+_lock = threading.Lock()
+_pending: dict[str, Future] = {}
+
+_client: Optional[OpenAI] = None
+
+
+def _get_client() -> OpenAI:
+    global _client
+    if _client is None:
+        _client = OpenAI()
+    return _client
+
+
+def speech_key(text: str, voice: str = TTS_VOICE, model: str = TTS_MODEL) -> str:
+    payload = json.dumps([text, voice, model], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_speech_key(key: str) -> bool:
+    return bool(_KEY.match(key or ""))
+
+
+def _ref_path(key: str) -> Path:
+    return TTS_DIR / f"{key}.ref"
+
+
+def _write_ref(key: str, digest: str) -> None:
+    ref = _ref_path(key)
+    tmp = ref.with_name(ref.name + ".tmp")
+    tmp.write_text(digest)
+    os.replace(tmp, ref)
+
+
+def speech_artifact(key: str) -> Optional[str]:
+    """Artifact hash of the finished audio for key, or None."""
+    try:
+        return _ref_path(key).read_text().strip() or None
+    except FileNotFoundError:
+        pass
+    legacy = TTS_DIR / f"{key}.mp3"  # audio cached before it moved to the artifact store
+    if legacy.exists():
+        digest = artifacts.put(legacy.read_bytes(), "audio/mpeg")
+        _write_ref(key, digest)
+        legacy.unlink(missing_ok=True)
+        return digest
+    return None
+
+
+def split_text(text: str, max_chars: int = TTS_CHUNK_CHARS) -> List[str]:
+    """Split on sentence boundaries into chunks of at most max_chars (words are never cut)."""
+    chunks, current = [], ""
+    for sentence in _SENTENCE_END.split(text.strip()):
+        pieces = [sentence]
+        if len(sentence) > max_chars:
+            pieces, line = [], ""
+            for word in sentence.split():
+                if line and len(line) + 1 + len(word) > max_chars:
+                    pieces.append(line)
+                    line = word
+                else:
+                    line = f"{line} {word}" if line else word
+            if line:
+                pieces.append(line)
+        for piece in pieces:
+            if current and len(current) + 1 + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _synthesize_chunk(text: str, voice: str, model: str) -> bytes:
+    client = _get_client()
+    try:
+        with client.audio.speech.with_streaming_response.create(
+                model=model,
+                voice=voice,
+                input=text
+        ) as resp:
+            return resp.read()
+    except Exception:
+        with client.audio.speech.with_streaming_response.create(
+                model=TTS_FALLBACK_MODEL,
+                voice=voice,
+                input=text
+        ) as resp:
+            return resp.read()
+
+
+def _synthesize(key: str, text: str, voice: str, model: str) -> str:
+    try:
+        # MP3 frames are self-delimiting, so chunk outputs can simply be concatenated.
+        parts = _chunks.map(lambda chunk: _synthesize_chunk(chunk, voice, model), split_text(text))
+        digest = artifacts.put(b"".join(parts), "audio/mpeg")
+        _write_ref(key, digest)
+        return digest
+    finally:
+        with _lock:
+            _pending.pop(key, None)
+
+
+def _grant_when_done(future: Future, owner: str) -> None:
+    if not future.cancelled() and future.exception() is None:
+        artifacts.grant(future.result(), owner)
+
+
+def request_speech(text: str, voice: str = TTS_VOICE, model: str = TTS_MODEL, owner: Optional[str] = None) -> str:
+    """Start synthesis in the background (unless cached or in flight) and return its key.
+    The audio artifact is readable by the owner clinic once it exists."""
+    key = speech_key(text, voice, model)
+    digest = speech_artifact(key)
+    if digest:
+        if owner is not None:
+            artifacts.grant(digest, owner)
+        return key
+    with _lock:
+        future = _pending.get(key)
+        if future is None:
+            future = _pending[key] = _jobs.submit(_synthesize, key, text, voice, model)
+    if owner is not None:
+        future.add_done_callback(lambda f: _grant_when_done(f, owner))
+    return key
+
+
+def pending_speech(key: str) -> Optional[Future]:
+    with _lock:
+        return _pending.get(key)
+
+
+def get_speech(key: str, timeout: Optional[float] = None) -> Optional[str]:
+    """Artifact hash of the audio for key, waiting up to timeout for an in-flight
+    synthesis. None when the key is unknown (never requested, or synthesis
+    failed); raises TimeoutError if synthesis is still running after timeout."""
+    digest = speech_artifact(key)
+    if digest:
+        return digest
+    future = pending_speech(key)
+    if future is None:
+        # it may have finished between the two checks
+        return speech_artifact(key)
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        raise
+    except Exception as e:
+        print(f"TTS for {key} failed: {e}")
+        return None
+
+
+async def aget_speech(key: str, timeout: Optional[float] = None) -> Optional[str]:
+    """Async twin of get_speech: waits on the event loop instead of a worker thread."""
+    future = pending_speech(key)
+    if future is not None:
+        try:
+            # shield: giving up on waiting must not cancel the synthesis itself
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(key)
+        except Exception as e:
+            print(f"TTS for {key} failed: {e}")
+            return None
+    return get_speech(key)
+
+
+def speech_url(key: str) -> str:
+    return f"/api/tts/{key}"
@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class BoundedCache:
+    """Thread-safe LRU cache bounded by entry count and/or total bytes, with idle TTL.
+
+    With sliding=False the TTL counts from insertion instead: hits neither
+    extend nor reorder entries, so eviction is FIFO and data that may change
+    elsewhere is re-read at least every `ttl` seconds.
+    `sizeof(value)` estimates the memory held by an entry; it is re-evaluated on
+    every hit so values that grow (e.g. chat memories) keep the budget honest.
+    `on_evict(key, value)` runs for entries dropped by the limits or the TTL.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+        sliding: bool = True,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sliding = sliding
+        self._sizeof = sizeof or (lambda _: 0)
+        self._on_evict = on_evict
+        self._lock = threading.RLock()
+        self._data: "OrderedDict[Hashable, list]" = OrderedDict()  # key -> [value, size, last_used]
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # ---- internals (call with the lock held) ----
+    def _expired(self, last_used: float, now: float) -> bool:
+        return self.ttl is not None and now - last_used > self.ttl
+
+    def _remove(self, key: Hashable) -> Any:
+        value, size, _ = self._data.pop(key)
+        self._bytes -= size
+        return value
+
+    def _evict_until_within_limits(self, now: float) -> list:
+        dropped = []
+        for key, (_, _, last_used) in list(self._data.items()):
+            if not self._expired(last_used, now):
+                break  # LRU/FIFO order: everything after this was used (or stored) more recently
+            dropped.append((key, self._remove(key)))
+            self.expirations += 1
+        while len(self._data) > 1 and (
+            (self.max_entries is not None and len(self._data) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            key = next(iter(self._data))
+            dropped.append((key, self._remove(key)))
+            self.evictions += 1
+        return dropped
+
+    def _notify(self, dropped: list) -> None:
+        if self._on_evict:
+            for key, value in dropped:
+                self._on_evict(key, value)
+
+    # ---- public API ----
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        dropped = []
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self._expired(entry[2], now):
+                dropped.append((key, self._remove(key)))
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                value = default
+            else:
+                self.hits += 1
+                value = entry[0]
+                size = self._sizeof(value)
+                self._bytes += size - entry[1]
+                entry[1] = size
+                if self.sliding:
+                    entry[2] = now
+                    self._data.move_to_end(key)
+                dropped += self._evict_until_within_limits(now)
+        self._notify(dropped)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        now = time.monotonic()
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = [value, size, now]
+            self._bytes += size
+            dropped = self._evict_until_within_limits(now)
+        self._notify(dropped)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            return self._remove(key)
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches predicate; returns how many."""
+        with self._lock:
+            keys = [k for k in self._data if predicate(k)]
+            for k in keys:
+                self._remove(k)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and not self._expired(entry[2], time.monotonic())
+
+    def __getitem__(self, key: Hashable) -> Any:
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.put(key, value)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
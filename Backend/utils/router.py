@@ -1,15 +1,108 @@
 # smart_librarian/router.py
-import importlib.util
-import os
-import sys
+import importlib
 import inspect
-from typing import List, Tuple, Union, Optional, Any
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from starlette.responses import Response
 
+from Backend.config.constants import ROUTER_RELOAD, ROUTER_RELOAD_INTERVAL
+
+CONTROLLERS_DIR = Path(__file__).resolve().parents[1] / "controllers"
+CONTROLLERS_PACKAGE = "Backend.controllers"
+
+# Binding plan step kinds
+_REQUEST, _PATH = 0, 1
+
+
+@dataclass
+class _Action:
+    call: Callable
+    is_async: bool
+    # one (kind, name, required) per positional parameter; kind is _REQUEST or _PATH
+    positional: List[Tuple[int, str, bool]]
+    request_kw: bool  # keyword-only `request` parameter
+
+
+@dataclass
+class _Controller:
+    class_name: str
+    actions: Dict[str, _Action] = field(default_factory=dict)
+    missing_class: bool = False
+
+
+def _plan(action: Callable) -> _Action:
+    """Precompute how path params and the request map onto the action's parameters."""
+    positional, request_kw = [], False
+    for p in inspect.signature(action).parameters.values():
+        if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD):
+            kind = _REQUEST if p.name == "request" else _PATH
+            positional.append((kind, p.name, p.default is inspect.Parameter.empty))
+        elif p.kind == p.KEYWORD_ONLY and p.name == "request":
+            request_kw = True
+        # We ignore VAR_POSITIONAL/VAR_KEYWORD; most controllers won't need them
+    return _Action(action, inspect.iscoroutinefunction(action), positional, request_kw)
+
+
+def _load_controller(path: Path, reload: bool = False) -> Tuple[str, _Controller]:
+    controller_name = path.stem[: -len("_controller")]
+    class_name = f"{controller_name.capitalize()}Controller"
+    module_name = f"{CONTROLLERS_PACKAGE}.{path.stem}"
+    module = sys.modules.get(module_name)
+    if module is not None and reload:
+        module = importlib.reload(module)
+    elif module is None:
+        module = importlib.import_module(module_name)
+
+    controller_class = getattr(module, class_name, None)
+    if controller_class is None:
+        return controller_name, _Controller(class_name, missing_class=True)
+
+    instance = controller_class()  # one instance per controller, reused by every request
+    controller = _Controller(class_name)
+    for name, member in inspect.getmembers(instance, callable):
+        if not name.startswith("_"):
+            controller.actions[name] = _plan(member)
+    return controller_name, controller
+
+
 class Router:
-    def __init__(self):
+    def __init__(self, reload: bool = ROUTER_RELOAD):
         self.default_controller = "home"
         self.default_action = "index"
+        self._mtimes: Dict[Path, float] = {}
+        self._routes: Dict[str, _Controller] = self._build()
+        if reload:
+            threading.Thread(target=self._watch, name="router-reload", daemon=True).start()
+
+    def _scan(self) -> Dict[Path, float]:
+        return {p: p.stat().st_mtime for p in sorted(CONTROLLERS_DIR.glob("*_controller.py"))}
+
+    def _build(self) -> Dict[str, _Controller]:
+        """Route table: controller name -> actions with their binding plans.
+        Modules changed since the previous build are reloaded."""
+        mtimes = self._scan()
+        routes = {}
+        for path, mtime in mtimes.items():
+            changed = path in self._mtimes and self._mtimes[path] != mtime
+            name, controller = _load_controller(path, reload=changed)
+            routes[name] = controller
+        self._mtimes = mtimes
+        return routes
+
+    def _watch(self) -> None:
+        """Dev mode (ROUTER_RELOAD=1): rebuild the table when a controller file changes."""
+        while True:
+            time.sleep(ROUTER_RELOAD_INTERVAL)
+            try:
+                if self._scan() != self._mtimes:
+                    self._routes = self._build()
+                    print(f"Router reloaded: {sorted(self._routes)}")
+            except Exception as e:  # keep serving the previous table
+                print(f"Router reload failed: {e}")
 
     async def route(self, path: str, request: Optional[Any] = None) -> Union[str, Tuple[str, int]]:
         """
@@ -35,61 +128,39 @@ class Router:
             action_name = parts[1] if len(parts) > 1 else self.default_action
             params = parts[2:] if len(parts) > 2 else []
 
-        controller_file = f"Backend/controllers/{controller_name}_controller.py"
-        class_name = f"{controller_name.capitalize()}Controller"
-
-        if not os.path.isfile(controller_file):
+        controller = self._routes.get(controller_name)
+        if controller is None:
             return ("Error: Page not found <br> <a href='/home/index'>Go to Home</a>", 404)
+        if controller.missing_class:
+            return (f"Error: Controller '{controller.class_name}' not found", 404)
 
-        spec = importlib.util.spec_from_file_location(class_name, controller_file)
-        module = importlib.util.module_from_spec(spec)
-        sys.modules[class_name] = module
-        assert spec and spec.loader, "Failed to load controller module spec"
-        spec.loader.exec_module(module)
-
-        controller_class = getattr(module, class_name, None)
-        if controller_class is None:
-            return (f"Error: Controller '{class_name}' not found", 404)
-
-        controller_instance = controller_class()
-        if not hasattr(controller_instance, action_name):
-            return (f"Error: Action '{action_name}' not found in {class_name}", 404)
-
-        action = getattr(controller_instance, action_name)
+        action = controller.actions.get(action_name)
+        if action is None:
+            return (f"Error: Action '{action_name}' not found in {controller.class_name}", 404)
 
         # Best-effort: pass the Request object if the method accepts it
         # We only pass arguments the action can actually take.
-        sig = inspect.signature(action)
         call_args = []
-        kw_args = {}
         params_iter = iter(params)
-
-        # Map positional path params first
-        for p in sig.parameters.values():
-            if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD):
-                if p.name == "request" and request is not None:
-                    call_args.append(request)
-                elif params:
-                    # consume next str param from path if available
-                    try:
-                        call_args.append(next(params_iter))
-                    except StopIteration:
-                        # no more path params; rely on default if any
-                        if p.default is inspect._empty:
-                            return (f"Error: Missing parameter '{p.name}' for {class_name}.{action_name}", 400)
-                else:
-                    # rely on default or error
-                    if p.default is inspect._empty and p.name != "request":
-                        return (f"Error: Missing parameter '{p.name}' for {class_name}.{action_name}", 400)
-            elif p.kind == p.KEYWORD_ONLY and p.name == "request" and request is not None:
-                kw_args["request"] = request
-            # We ignore VAR_POSITIONAL/VAR_KEYWORD; most controllers won't need them
+        for kind, name, required in action.positional:
+            if kind == _REQUEST and request is not None:
+                call_args.append(request)
+            elif params:
+                # consume next str param from path if available
+                value = next(params_iter, None)
+                if value is not None:
+                    call_args.append(value)
+                elif required:
+                    return (f"Error: Missing parameter '{name}' for {controller.class_name}.{action_name}", 400)
+            elif required and kind != _REQUEST:
+                return (f"Error: Missing parameter '{name}' for {controller.class_name}.{action_name}", 400)
+        kw_args = {"request": request} if action.request_kw and request is not None else {}
 
         # Support both sync and async controller actions
-        if inspect.iscoroutinefunction(action):
-            result = await action(*call_args, **kw_args)
+        if action.is_async:
+            result = await action.call(*call_args, **kw_args)
         else:
-            result = action(*call_args, **kw_args)
+            result = action.call(*call_args, **kw_args)
 
         # Normalize: allow string or (string, status)
         if isinstance(result, tuple) and len(result) == 2 and isinstance(result[0], str) and isinstance(result[1], int):
@@ -0,0 +1,130 @@
+import gzip
+import hashlib
+import html
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from starlette.responses import HTMLResponse, Response
+
+try:  # optional: brotli variants are only served when the package is installed
+    import brotli
+except ImportError:
+    brotli = None
+
+FRONTEND_DIR = Path(__file__).resolve().parents[2] / "Frontend"
+
+_PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+_MIN_COMPRESS_BYTES = 1024
+
+
+@dataclass
+class Template:
+    """A Frontend page split at its {{placeholders}}: parts alternate literal text and names."""
+    path: Path
+    mtime: float
+    parts: List[str]
+    etag: str = ""
+    # encoding ("identity", "gzip", "br") -> body; only filled for pages without placeholders
+    variants: Dict[str, bytes] = field(default_factory=dict)
+
+    @property
+    def static(self) -> bool:
+        return len(self.parts) == 1
+
+    def render(self, **values: str) -> str:
+        """Fill placeholders with HTML-escaped values; unknown names render empty."""
+        out = list(self.parts)
+        for i in range(1, len(out), 2):
+            out[i] = html.escape(str(values.get(out[i], "")))
+        return "".join(out)
+
+
+_lock = threading.Lock()
+_templates: Dict[str, Template] = {}
+
+
+def _compile(path: Path, mtime: float) -> Template:
+    text = path.read_text(encoding="utf-8")
+    template = Template(path=path, mtime=mtime, parts=_PLACEHOLDER.split(text))
+    if template.static:
+        body = text.encode("utf-8")
+        template.etag = hashlib.sha256(body).hexdigest()[:32]
+        template.variants["identity"] = body
+        if len(body) >= _MIN_COMPRESS_BYTES:
+            template.variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                template.variants["br"] = brotli.compress(body, quality=11)
+    return template
+
+
+def get_template(name: str) -> Template:
+    """Template for Frontend/<name>, loaded once and reloaded when the file changes."""
+    path = FRONTEND_DIR / name
+    mtime = path.stat().st_mtime
+    template = _templates.get(name)
+    if template is None or template.mtime != mtime:
+        with _lock:
+            template = _templates.get(name)
+            if template is None or template.mtime != mtime:
+                template = _templates[name] = _compile(path, mtime)
+    return template
+
+
+def render_template(name: str, **values: str) -> str:
+    return get_template(name).render(**values)
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def _pick_encoding(template: Template, accept_encoding: str) -> str:
+    accepted = _accepted_encodings(accept_encoding)
+    for coding in ("br", "gzip"):
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if coding in template.variants and q > 0:
+            return coding
+    return "identity"
+
+
+def static_page_response(name: str, request: Optional[Request] = None) -> Response:
+    """Serve a placeholder-free page from memory, precompressed per Accept-Encoding,
+    with a strong per-encoding ETag and 304 on If-None-Match."""
+    template = get_template(name)
+    if not template.static:
+        return HTMLResponse(content=template.render(), status_code=200)
+
+    headers = request.headers if request is not None else {}
+    encoding = _pick_encoding(template, headers.get("accept-encoding", ""))
+    etag = f'"{template.etag}"' if encoding == "identity" else f'"{template.etag}-{encoding}"'
+    response_headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+    if_none_match = headers.get("if-none-match", "")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=response_headers)
+
+    if encoding != "identity":
+        response_headers["Content-Encoding"] = encoding
+    return Response(
+        content=template.variants[encoding],
+        status_code=200,
+        media_type="text/html; charset=utf-8",
+        headers=response_headers,
+    )
@@ -1,105 +1,147 @@
-import base64
+import asyncio
 import re
+from typing import Optional
 import duckdb
-from typing import Callable
 from langchain_community.agent_toolkits import create_sql_agent
-from langchain_community.utilities import SQLDatabase
-from langchain.tools import tool
-import pandas as pd
-import io
-import matplotlib.pyplot as plt
-from openai import OpenAI
-from Database.db import get_engine
-
-from Backend.config.constants import DATA_PATH, DB_FILE
-
-bots: dict[int, Callable] = {}
+from langchain.tools import StructuredTool
+from sqlalchemy.exc import DBAPIError
+from Database.db import clinic_engine
+from Backend.utils.cache import BoundedCache
+from Backend.services.schema_service import clinic_tables
+from Backend.services.sql_cache import CachedSQLDatabase
+from Backend.services.nl_sql import UnsafeSQL, generate_sql, agenerate_sql, run_query, validate_read_only
+from Backend.services.tts_service import request_speech, speech_url
+from Backend.services.artifact_store import artifacts, artifact_hash_from_url
+from Backend.services.chart_service import is_chart_spec_url, make_chart_artifact
+from Backend.services.chart_data import chart_data, chart_data_for_result
+from Backend.services.result_store import get_result, store_query
+
+from Backend.config.constants import (
+    DATA_PATH, AGENT_CACHE_MAX_ENTRIES, AGENT_CACHE_MAX_MB, AGENT_CACHE_TTL_SECONDS,
+    SQL_TOOL_MODE, CHART_OUTPUT
+)
+
+# conversation id -> ChatAgent; evicted agents are rebuilt from the stored messages
+bots: BoundedCache = BoundedCache(
+    max_entries=AGENT_CACHE_MAX_ENTRIES,
+    max_bytes=AGENT_CACHE_MAX_MB * 1024 * 1024,
+    ttl=AGENT_CACHE_TTL_SECONDS,
+    sizeof=lambda agent: agent.approx_size(),
+)
 
 def is_image(s: str) -> bool:
     auxiliar = re.compile(r"^data:image/png;base64,", re.IGNORECASE)
-    return bool(auxiliar.match(s.strip()))
-
-def text_to_speech(s:str) -> str:
-    client = OpenAI()
-
-    try:
-        with client.audio.speech.with_streaming_response.create(
-                model="gpt-4o-mini-tts",
-                voice="alloy",
-                input=s
-        ) as resp:
-            audio_bytes = resp.read()
-    except Exception:
-        with client.audio.speech.with_streaming_response.create(
-                model="gpt-4o-realtime-preview-2024-12-17",
-                voice="alloy",
-                input=s
-        ) as resp:
-            audio_bytes = resp.read()
-
-    audio_b64 = base64.b64encode(audio_bytes).decode("utf-8")
-    helper = f'data:audio/mpeg;base64,{audio_b64}'
-    return f'<audio>{helper}</audio>'
-
-
-def build_sql_tool(llm, clinic_code, db_path=DATA_PATH):
-    to_be_included = []
-    
-    engine = get_engine()
-    with engine.connect() as con:
-        tables = con.exec_driver_sql("SHOW TABLES").fetchall()
-        print("ALL TABLES:", tables)    
-        for (t,) in tables:
-            if t.startswith(clinic_code):
-                print("INLUDE TABLE", t)
-                to_be_included.append(t)
-
-    print(to_be_included)
-
-    db = SQLDatabase(engine=engine, include_tables=to_be_included)
-    sql_agent = create_sql_agent(llm, db=db, top_k=10)
-
-    @tool("sql_query_tool")
-    def run_sql(natural_language: str) -> str:
-        """Ask natural language questions about the database and get structured results."""
-        return sql_agent.invoke({"input": natural_language})
-    return run_sql
-
-
-@tool("make_chart", return_direct=True)
-def make_chart(data_from_sql_query_tool: list, x: str, y: str, chart: str = "bar") -> str:
-
-    """Create a chart from SQL results.
-    Args:
-        data_from_sql_query_tool: List of dicts containing query results.
-        x: Column name for X-axis.
-        y: Column name for Y-axis.
-        chart: One of ["bar", "line", "pie", etc.]. Default is "bar".
-    Returns:
-        Raw PNG bytes.
-    """
-    df = pd.DataFrame(data_from_sql_query_tool)
-    fig, ax = plt.subplots(figsize=(6, 4))
-
-    if chart == "line":
-        df.plot(x=x, y=y, kind="line", ax=ax)
-    elif chart == "pie":
-        df.set_index(x)[y].plot(kind="pie", ax=ax, autopct="%1.1f%%")
-        ax.set_ylabel("")
-    elif chart == "scatter":
-        df.plot.scatter(x=x, y=y, ax=ax)
-    elif chart == "histogram":
-        ax.hist(df[x], weights=df[y], bins=30)
-        ax.set_xlabel(x)
-        ax.set_ylabel(y)
-    elif chart == "box":
-        df[[x, y]].plot.box(ax=ax)
-    else:
-        df.plot(x=x, y=y, kind="bar", ax=ax)
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=100, bbox_inches="tight")
-    plt.close(fig)
-    buf.seek(0)
-    b64 = base64.b64encode(buf.read()).decode("utf-8")
-    return f"data:image/png;base64,{b64}"
+    if auxiliar.match(s.strip()):
+        return True
+    digest = artifact_hash_from_url(s)
+    return bool(digest) and (artifacts.media_type(digest) or "").startswith("image/")
+
+def is_chart_spec(s: str) -> bool:
+    """A make_chart result meant to be drawn client-side (Vega-Lite spec artifact)."""
+    return is_chart_spec_url(s)
+
+def text_to_speech(s:str, clinic_id: Optional[str] = None) -> str:
+    """Queue synthesis of s for the clinic and return an audio tag pointing at the cached result."""
+    key = request_speech(s, owner=clinic_id)
+    return f'<audio>{speech_url(key)}</audio>'
+
+
+def build_sql_tool(llm, clinic_code, db_path=DATA_PATH, mode=SQL_TOOL_MODE, conversation_id=None):
+    to_be_included = clinic_tables(clinic_code)
+    print("INCLUDE TABLES", to_be_included)
+
+    sql_agent = None
+
+    def get_sql_agent():
+        # in direct mode the agent is only needed as a fallback, so build it on first use
+        nonlocal sql_agent
+        if sql_agent is None:
+            db = CachedSQLDatabase(engine=clinic_engine(clinic_code), include_tables=to_be_included,
+                                   view_support=True, clinic_id=clinic_code)
+            sql_agent = create_sql_agent(llm, db=db, top_k=10)
+        return sql_agent
+
+    if mode != "direct":
+        get_sql_agent()
+
+        def run_sql(natural_language: str) -> str:
+            """Ask natural language questions about the database and get structured results."""
+            return sql_agent.invoke({"input": natural_language})
+
+        async def arun_sql(natural_language: str) -> str:
+            """Ask natural language questions about the database and get structured results."""
+            return await sql_agent.ainvoke({"input": natural_language})
+
+        return StructuredTool.from_function(func=run_sql, coroutine=arun_sql, name="sql_query_tool")
+
+    def execute(sql: str) -> dict:
+        if conversation_id is None:
+            return run_query(clinic_code, sql, to_be_included)
+        # the full result stays server-side; the model gets a handle, the schema and a preview
+        validate_read_only(sql, to_be_included)
+        return store_query(conversation_id, clinic_code, sql).describe()
+
+    def run_sql(natural_language: str) -> dict:
+        """Ask natural language questions about the database. Returns the SQL that was run,
+        a handle to the full result (pass it to make_chart), its schema, row count and first rows."""
+        sql = generate_sql(llm, clinic_code, natural_language)
+        try:
+            return execute(sql)
+        except UnsafeSQL as e:
+            return {"sql": sql, "error": f"Query refused: {e}"}
+        except (DBAPIError, duckdb.Error) as e:
+            print(f"Direct SQL failed ({e}); falling back to the SQL agent")
+            return get_sql_agent().invoke({"input": natural_language})
+
+    async def arun_sql(natural_language: str) -> dict:
+        """Ask natural language questions about the database. Returns the SQL that was run,
+        a handle to the full result (pass it to make_chart), its schema, row count and first rows."""
+        sql = await agenerate_sql(llm, clinic_code, natural_language)
+        try:
+            return await asyncio.to_thread(execute, sql)
+        except UnsafeSQL as e:
+            return {"sql": sql, "error": f"Query refused: {e}"}
+        except (DBAPIError, duckdb.Error) as e:
+            print(f"Direct SQL failed ({e}); falling back to the SQL agent")
+            return await get_sql_agent().ainvoke({"input": natural_language})
+
+    return StructuredTool.from_function(func=run_sql, coroutine=arun_sql, name="sql_query_tool")
+
+
+def build_chart_tool(clinic_code, output=CHART_OUTPUT, conversation_id=None):
+    allowed_tables = clinic_tables(clinic_code)
+
+    def make_chart(x: str, y: str, chart: str = "bar", handle: Optional[str] = None, sql: Optional[str] = None,
+                   data_from_sql_query_tool: Optional[list] = None) -> str:
+        """Create a chart from SQL results.
+        Args:
+            x: Column name for X-axis.
+            y: Column name for Y-axis.
+            chart: One of ["bar", "line", "pie", "scatter", "histogram", "box"]. Default is "bar".
+            handle: The result handle returned by sql_query_tool (preferred).
+            sql: The SQL returned by sql_query_tool, when no handle is available.
+            data_from_sql_query_tool: List of dicts containing query results, when neither is available.
+        Returns:
+            URL of the PNG (or of the chart spec) in the artifact store.
+        """
+        records, summary = data_from_sql_query_tool or [], None
+        result = get_result(conversation_id, handle) if handle and conversation_id is not None else None
+        if handle and result is None and not (sql or data_from_sql_query_tool):
+            return f"Unknown or expired result handle {handle!r}; run sql_query_tool again."
+        if result is not None:
+            try:
+                records, summary = chart_data_for_result(result, x, y, chart)
+            except duckdb.Error as e:
+                return f"Could not build the chart: {e}"
+        elif sql:
+            try:
+                records, summary = chart_data(clinic_code, sql, x, y, chart, allowed_tables)
+            except (UnsafeSQL, DBAPIError, duckdb.Error) as e:
+                if not data_from_sql_query_tool:
+                    return f"Could not build the chart: {e}"
+                print(f"Chart aggregation failed ({e}); charting the rows passed in")
+        if not records and not any((summary or {}).values()):  # e.g. no numeric values to bin or box
+            return f"No numeric data to chart for {x!r}/{y!r}: the query returned no usable values."
+        return make_chart_artifact(records, x, y, chart, output=output, summary=summary, owner=clinic_code)
+
+    return StructuredTool.from_function(func=make_chart, name="make_chart", return_direct=True)
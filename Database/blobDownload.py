@@ -0,0 +1,174 @@
+# Database/blobDownload.py
+import base64
+import hashlib
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "8"))
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "3"))
+DOWNLOAD_BACKOFF = float(os.getenv("DOWNLOAD_BACKOFF", "0.5"))  # seconds, doubled per retry
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+@dataclass
+class DownloadResult:
+    name: str
+    path: Path
+    size: int
+    seconds: float
+    attempts: int
+
+
+class _HashingWriter:
+    """File wrapper that hashes bytes as they are streamed to disk."""
+
+    def __init__(self, f):
+        self._f = f
+        self.md5 = hashlib.md5()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.md5.update(data)
+        self.size += len(data)
+        return self._f.write(data)
+
+    def flush(self) -> None:
+        self._f.flush()
+
+
+def _download_once(blob, path: Path) -> int:
+    part = path.with_name(path.name + ".part")
+    try:
+        with open(part, "wb") as f:
+            writer = _HashingWriter(f)
+            blob.download_to_file(writer)
+        expected = getattr(blob, "md5_hash", None)
+        actual = base64.b64encode(writer.md5.digest()).decode("ascii")
+        if expected and expected != actual:
+            raise ChecksumMismatch(f"{blob.name}: expected md5 {expected}, got {actual}")
+        os.replace(part, path)
+        return writer.size
+    finally:
+        part.unlink(missing_ok=True)
+
+
+def _download_with_retries(blob, path: Path, retries: int, backoff: float) -> DownloadResult:
+    start = time.perf_counter()
+    for attempt in range(1, retries + 2):
+        try:
+            size = _download_once(blob, path)
+            return DownloadResult(blob.name, path, size, time.perf_counter() - start, attempt)
+        except Exception as e:
+            if attempt > retries:
+                raise
+            delay = backoff * 2 ** (attempt - 1)
+            print(f"Download of {blob.name} failed ({e}); retry {attempt}/{retries} in {delay:.2f}s")
+            time.sleep(delay)
+
+
+def download_blobs(
+    blobs: Iterable,
+    local_dir,
+    workers: Optional[int] = None,
+    retries: int = DOWNLOAD_RETRIES,
+    backoff: float = DOWNLOAD_BACKOFF,
+) -> List[DownloadResult]:
+    """Download blobs into local_dir with bounded concurrency.
+
+    Each file is streamed to a .part file while its MD5 is computed, checked
+    against the blob's md5_hash, then renamed into place. Failed downloads are
+    retried with exponential backoff. Results keep the input order.
+    """
+    blobs = list(blobs)
+    if not blobs:
+        return []
+    local_dir = Path(local_dir)
+    local_dir.mkdir(parents=True, exist_ok=True)
+    workers = max(1, min(workers or DOWNLOAD_WORKERS, len(blobs)))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download") as pool:
+        futures = [
+            pool.submit(_download_with_retries, b, local_dir / b.name.split("/")[-1], retries, backoff)
+            for b in blobs
+        ]
+        return [f.result() for f in futures]
+
+
+# -------- local directory-backed bucket (tests / offline runs) --------
+class LocalDirBlob:
+    def __init__(self, root: Path, name: str):
+        self._root = root
+        self.name = name
+        self._path = root / name
+
+    @property
+    def size(self) -> Optional[int]:
+        return self._path.stat().st_size if self._path.exists() else None
+
+    @property
+    def generation(self) -> Optional[int]:
+        return self._path.stat().st_mtime_ns if self._path.exists() else None
+
+    @property
+    def updated(self) -> Optional[datetime]:
+        if not self._path.exists():
+            return None
+        return datetime.fromtimestamp(self._path.stat().st_mtime, tz=timezone.utc)
+
+    @property
+    def md5_hash(self) -> Optional[str]:
+        if not self._path.exists():
+            return None
+        md5 = hashlib.md5()
+        with open(self._path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                md5.update(chunk)
+        return base64.b64encode(md5.digest()).decode("ascii")
+
+    def exists(self) -> bool:
+        return self._path.is_file()
+
+    def delete(self) -> None:
+        self._path.unlink()
+
+    def download_to_file(self, file_obj) -> None:
+        with open(self._path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                file_obj.write(chunk)
+
+    def download_to_filename(self, filename) -> None:
+        shutil.copyfile(self._path, filename)
+
+    def upload_from_file(self, file_obj, content_type: Optional[str] = None) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._path, "wb") as f:
+            shutil.copyfileobj(file_obj, f)
+
+    def generate_signed_url(self, **_) -> str:
+        return self._path.resolve().as_uri()
+
+
+class LocalDirBucket:
+    """Minimal stand-in for a google.cloud.storage Bucket backed by a directory."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def blob(self, name: str) -> LocalDirBlob:
+        return LocalDirBlob(self.root, name)
+
+    def list_blobs(self, prefix: str = ""):
+        for path in sorted(self.root.rglob("*")):
+            name = path.relative_to(self.root).as_posix()
+            if path.is_file() and name.startswith(prefix):
+                yield LocalDirBlob(self.root, name)
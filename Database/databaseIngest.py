@@ -1,6 +1,7 @@
 # Database/databaseIngest.py
-import duckdb, pandas as pd, unicodedata, hashlib, re
+import duckdb, pandas as pd, unicodedata, hashlib, re, os
 from pathlib import Path
+from pandas.tseries.api import guess_datetime_format
 from db import get_engine
 
 CSV = Path("./healthcare_dataset.csv")  # adjust if needed
@@ -49,17 +50,54 @@ def _first_token_until_any_sep(s: str | None) -> str | None:
     # split once on the first separator encountered
     return _SEP_PATTERN.split(s, maxsplit=1)[0]
 
-def ingestion():
-    df = pd.read_csv(CSV)
+CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "100000"))  # CSV rows parsed and normalized per step
+
+# The scalar helpers above define the semantics; the functions below apply them to
+# whole columns. Work is done once per distinct value (pd.factorize) with pandas .str
+# methods, which call the same str methods per value, so results are identical.
+# (DuckDB's strip_accents is not the same fold as NFKD + ASCII-ignore, so the key
+# stays in pandas; the SHA-256 ids are computed by DuckDB.)
+
+_DATE_COLUMNS = ("date_of_admission", "discharge_date")
+
+def _norm_names(col: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """Vectorized _norm_name: (disp, key) columns, None where the input is missing."""
+    codes, uniques = pd.factorize(col)  # missing values get code -1
+    text = pd.Series(uniques, dtype=object).astype(str).str.split().str.join(" ")
+    disp = text.str.title()
+    key = text.str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii").str.lower()
+    return _take(disp, codes, col.index), _take(key, codes, col.index)
+
+def _first_tokens(col: pd.Series) -> pd.Series:
+    """Vectorized _first_token_until_any_sep."""
+    codes, uniques = pd.factorize(col)
+    text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    token = text.str.extract(r"^([^,;\-\s]*)", expand=False)  # prefix before the first separator
+    return _take(token.where(text != "", None), codes, col.index)
+
+def _take(values: pd.Series, codes, index) -> pd.Series:
+    out = pd.Series(values.to_numpy(dtype=object), dtype=object).reindex(codes).to_numpy(dtype=object)
+    out[codes < 0] = None
+    return pd.Series(out, index=index, dtype=object)
+
+def _date_format(col: pd.Series) -> str | None:
+    """The format pd.to_datetime would infer for the whole column (from its first value)."""
+    first = col.dropna()
+    if first.empty:
+        return None
+    return guess_datetime_format(str(first.iloc[0]))
 
+def _prepare_chunk(df: pd.DataFrame, date_formats: dict) -> pd.DataFrame:
     # normalize column names
     df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
 
     # parse dates and billing
-    if "date_of_admission" in df.columns:
-        df["date_of_admission"] = pd.to_datetime(df["date_of_admission"], errors="coerce").dt.date
-    if "discharge_date" in df.columns:
-        df["discharge_date"]    = pd.to_datetime(df["discharge_date"], errors="coerce").dt.date
+    for col in _DATE_COLUMNS:
+        if col in df.columns:
+            if col not in date_formats or date_formats[col] is None:
+                date_formats[col] = _date_format(df[col])
+            # kept as datetime64 here (cheap to hand to DuckDB) and cast to DATE in the final select
+            df[col] = pd.to_datetime(df[col], errors="coerce", format=date_formats[col])
     if "billing_amount" in df.columns:
         df["billing_amount"]    = pd.to_numeric(df["billing_amount"], errors="coerce")
 
@@ -67,44 +105,69 @@ def ingestion():
     if "name" not in df.columns:
         raise SystemExit("Expected 'name' column in CSV")
 
-    disp, key = zip(*df["name"].map(_norm_name))
-    df["patient_name"] = list(disp)
-    # key generated after the normalized name (without diacritics)
-    df["patient_id"] = [_gen_id_from_name(k) for k in key]
-    # we no longer keep the 'name' column
+    df["patient_name"], df["_patient_key"] = _norm_names(df["name"])
     df.drop(columns=["name"], inplace=True)
 
-    # ── clinic from 'hospital': retain only the first word up to the separator + generate clinic_id
+    # clinic from 'hospital': first word up to the separator, normalized
     if "hospital" in df.columns:
-        # draw the first token
-        hospital_first = df["hospital"].map(_first_token_until_any_sep)
-        # normalize (disp/key)
-        cdisp, ckey = zip(*hospital_first.map(_norm_name))
-        df["clinic_name"] = list(cdisp)
-        # shorter clinic_id (6 hex), from the key without diacritics
-        df["clinic_id"] = [_gen_id_from_name(k, length=6) for k in ckey]
-        # optionally, we remove the original 'hospital' column so as not to duplicate the information
+        df["clinic_name"], df["_clinic_key"] = _norm_names(_first_tokens(df["hospital"]))
         df.drop(columns=["hospital"], inplace=True)
     else:
         # if there is no 'hospital', we still add the columns as None, so that the schema remains stable
         df["clinic_name"] = None
         df["clinic_id"] = None
-
-    # drop duplicate names entirely (keep only unique patient names)
-    counts = df["patient_name"].value_counts(dropna=True)
-    dupes = counts[counts > 1].index
-    before = len(df)
-    df = df[~df["patient_name"].isin(dupes)].copy()
-    after = len(df)
-
-    print(f"Dropped {before - after} rows due to duplicate patient names.")
-
-    # load into DuckDB
-    with duckdb.connect(str(DB)) as con:
-        con.register("df", df)
+    return df
+
+def _id_sql(key: str, length: int) -> str:
+    """_gen_id_from_name in SQL: truncated SHA-256 of the key, NULL for a missing/empty key."""
+    return f"CASE WHEN coalesce({key}, '') = '' THEN NULL ELSE left(sha256({key}), {length}) END"
+
+def ingestion(csv_path: Path = CSV, db_path: Path = DB, chunk_rows: int = CHUNK_ROWS):
+    with duckdb.connect(str(db_path)) as con:
+        # 1) stream the CSV in chunks; each one is normalized and parked in a temp table
+        chunks, offset, date_formats = [], 0, {}
+        for df in pd.read_csv(csv_path, chunksize=chunk_rows):
+            df = _prepare_chunk(df, date_formats)
+            df["_row"] = range(offset, offset + len(df))
+            offset += len(df)
+            name = f"_ingest_chunk_{len(chunks)}"
+            con.register("chunk_df", df)
+            con.execute(f"CREATE OR REPLACE TEMP TABLE {name} AS SELECT * FROM chunk_df;")
+            con.unregister("chunk_df")
+            chunks.append(name)
+        if not chunks:
+            raise SystemExit("CSV has no rows")
+
+        # 2) final column order matches the row-by-row pipeline: ..., patient_name, patient_id, clinic_name, clinic_id
+        columns = [r[0] for r in con.execute(f"DESCRIBE {chunks[0]};").fetchall()]
+        select = []
+        for c in columns:
+            if c in ("_row", "_patient_key", "_clinic_key"):
+                continue
+            select.append(f'CAST("{c}" AS DATE) AS "{c}"' if c in _DATE_COLUMNS else f'"{c}"')
+            if c == "patient_name":
+                select.append(f"{_id_sql('_patient_key', 16)} AS patient_id")
+            elif c == "clinic_name" and "_clinic_key" in columns:
+                select.append(f"{_id_sql('_clinic_key', 6)} AS clinic_id")
+
+        # 3) drop duplicate names entirely (keep only unique patient names), in file order;
+        #    UNION ALL BY NAME promotes types across chunks like a single read_csv would
+        union = " UNION ALL BY NAME ".join(f"SELECT * FROM {c}" for c in chunks)
         con.execute("DROP VIEW IF EXISTS vw_entries;")
         con.execute("DROP TABLE IF EXISTS entries;")
-        con.execute("CREATE TABLE entries AS SELECT * FROM df;")
+        con.execute(f"""
+            CREATE TABLE entries AS
+            SELECT {", ".join(select)}
+            FROM ({union}) AS staged
+            QUALIFY count(patient_name) OVER (PARTITION BY patient_name) <= 1
+            ORDER BY _row;
+        """)
+        for c in chunks:
+            con.execute(f"DROP TABLE {c};")
+
+        total = con.execute("SELECT COUNT(*) FROM entries;").fetchone()[0]
+        print(f"Dropped {offset - total} rows due to duplicate patient names.")
+
         con.execute("CREATE OR REPLACE VIEW vw_entries AS SELECT * FROM entries;")
         # index on generated keys
         con.execute("CREATE INDEX IF NOT EXISTS idx_entries_patientid ON entries(patient_id);")
@@ -115,5 +178,3 @@ def ingestion():
 
 if __name__ == "__main__":
     ingestion()
-
-
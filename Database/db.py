@@ -1,24 +1,237 @@
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Dict, Iterator, Optional
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Connection, Engine
 import duckdb
 
-DB_PATH = str(Path("./data/mydb.duckdb").resolve())
+DB_PATH = str(Path("./data/mydb.duckdb").resolve())  # legacy shared file (see Database/migrate_shared_db.py)
+CLINIC_DB_DIR = Path(os.getenv("CLINIC_DB_DIR", "./data/clinics")).resolve()  # one <clinic_id>.duckdb per clinic
+CLINIC_DB_IDLE_SECONDS = float(os.getenv("CLINIC_DB_IDLE_SECONDS", "300"))  # close a clinic's connections after this idle time
 
 CANONICAL_CFG = {
     "threads": "4",
     "memory_limit": "4GB",
     "temp_directory": "/tmp/duckdb",
 }
+# Each clinic file is its own DuckDB instance, so limits apply per open clinic:
+# keep them small, or N open clinics could commit N x the shared file's budget.
+CLINIC_CFG = {
+    "threads": os.getenv("CLINIC_DB_THREADS", "1"),
+    "memory_limit": os.getenv("CLINIC_DB_MEMORY_LIMIT", "512MB"),  # larger work spills to temp_directory
+    "temp_directory": "/tmp/duckdb",
+}
 READ_ONLY = False
 
+POOL_SIZE = int(os.getenv("DUCKDB_POOL_SIZE", "8"))
+POOL_MAX_OVERFLOW = int(os.getenv("DUCKDB_POOL_MAX_OVERFLOW", "8"))
+
+_CLINIC_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def clinic_db_path(clinic_id: str) -> str:
+    if not _CLINIC_ID.match(clinic_id or ""):
+        raise ValueError(f"invalid clinic id: {clinic_id!r}")
+    return str(CLINIC_DB_DIR / f"{clinic_id}.duckdb")
+
+
+class _WriterLock:
+    """Serializes writers of one database file and records how long they waited."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = threading.Lock()
+        self.acquisitions = 0
+        self.waiting = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.held_seconds_total = 0.0
+
+    @contextmanager
+    def hold(self) -> Iterator[None]:
+        with self._meta:
+            self.waiting += 1
+        start = time.perf_counter()
+        self._lock.acquire()
+        acquired = time.perf_counter()
+        waited = acquired - start
+        with self._meta:
+            self.waiting -= 1
+            self.acquisitions += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        try:
+            yield
+        finally:
+            held = time.perf_counter() - acquired
+            self._lock.release()
+            with self._meta:
+                self.held_seconds_total += held
+
+    def stats(self) -> dict:
+        with self._meta:
+            return {
+                "locked": self._lock.locked(),
+                "waiting": self.waiting,
+                "acquisitions": self.acquisitions,
+                "wait_seconds_total": round(self.wait_seconds_total, 4),
+                "wait_seconds_max": round(self.wait_seconds_max, 4),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.acquisitions, 4) if self.acquisitions else None,
+                "held_seconds_total": round(self.held_seconds_total, 4),
+            }
+
+
+class EngineRegistry:
+    """One SQLAlchemy engine (and connection pool) per DuckDB file for the whole process.
+
+    Pooled connections to the same file share one DuckDB instance, so readers
+    see committed data through MVCC while a writer works. Writers go through
+    writer(), which serializes them per file: DuckDB allows a single writer,
+    and concurrent DDL on one catalog would otherwise fail with conflicts.
+
+    Files opened with idle_close=True (clinic databases) get the small
+    CLINIC_CFG limits and have their pooled connections closed once unused for
+    CLINIC_DB_IDLE_SECONDS, which releases the file; the engine object stays
+    registered and reconnects on next use.
+    """
+
+    def __init__(self, idle_seconds: float = CLINIC_DB_IDLE_SECONDS):
+        self._lock = threading.Lock()
+        self._engines: Dict[str, Engine] = {}
+        self._writers: Dict[str, _WriterLock] = {}
+        self._last_used: Dict[str, float] = {}
+        self._idle_close: set = set()
+        self.idle_seconds = idle_seconds
+        self._last_sweep = time.monotonic()
+        self.idle_closes = 0
+
+    def engine(self, path: str = DB_PATH, idle_close: bool = False) -> Engine:
+        now = time.monotonic()
+        if now - self._last_sweep > min(self.idle_seconds, 60):
+            self._last_sweep = now
+            self.close_idle()
+        self._last_used[path] = now
+        engine = self._engines.get(path)
+        if engine is None:
+            with self._lock:
+                engine = self._engines.get(path)
+                if engine is None:
+                    Path(path).parent.mkdir(parents=True, exist_ok=True)
+                    # SAME DSN + SAME connect_args everywhere
+                    engine = create_engine(
+                        f"duckdb:///{path}",
+                        connect_args={"config": CLINIC_CFG if idle_close else CANONICAL_CFG, "read_only": READ_ONLY},
+                        pool_pre_ping=True,  # helps detect dead conns
+                        pool_size=POOL_SIZE,
+                        max_overflow=POOL_MAX_OVERFLOW,
+                    )
+                    self._engines[path] = engine
+                    self._writers[path] = _WriterLock()
+                    if idle_close:
+                        self._idle_close.add(path)
+        return engine
+
+    def close_idle(self, max_idle: Optional[float] = None) -> int:
+        """Close the pooled connections of idle clinic databases; returns how many were closed."""
+        max_idle = self.idle_seconds if max_idle is None else max_idle
+        now = time.monotonic()
+        closed = 0
+        with self._lock:
+            for path in self._idle_close:
+                engine = self._engines.get(path)
+                if (
+                    engine is None
+                    or now - self._last_used.get(path, now) < max_idle
+                    or engine.pool.checkedout()
+                    or self._writers[path]._lock.locked()
+                    or not engine.pool.checkedin()
+                ):
+                    continue
+                engine.dispose()
+                closed += 1
+            self.idle_closes += closed
+        return closed
+
+    @contextmanager
+    def reader(self, path: str = DB_PATH, idle_close: bool = False) -> Iterator[Connection]:
+        """Pooled connection whose transaction is always rolled back, so nothing run
+        through it (e.g. model-written SQL) can persist changes."""
+        with self.engine(path, idle_close).connect() as con:
+            try:
+                yield con
+            finally:
+                con.rollback()
+
+    @contextmanager
+    def writer(self, path: str = DB_PATH, idle_close: bool = False) -> Iterator[Connection]:
+        """The file's single writer: one transaction, committed on success."""
+        engine = self.engine(path, idle_close)
+        with self._writers[path].hold():
+            with engine.begin() as con:
+                yield con
+
+    def dispose(self, path: Optional[str] = None) -> None:
+        with self._lock:
+            paths = [path] if path else list(self._engines)
+            for p in paths:
+                engine = self._engines.pop(p, None)
+                self._writers.pop(p, None)
+                self._last_used.pop(p, None)
+                self._idle_close.discard(p)
+                if engine is not None:
+                    engine.dispose()
+
+    def stats(self) -> dict:
+        with self._lock:
+            items = list(self._engines.items())
+        now = time.monotonic()
+        return {
+            path: {
+                "attached": bool(engine.pool.checkedin() or engine.pool.checkedout()),
+                "idle_seconds": round(now - self._last_used.get(path, now), 1),
+                "pool": {
+                    "size": engine.pool.size(),
+                    "checked_out": engine.pool.checkedout(),
+                    "checked_in": engine.pool.checkedin(),
+                    "overflow": engine.pool.overflow(),
+                },
+                "writer": self._writers[path].stats(),
+            }
+            for path, engine in items
+        }
+
+
+registry = EngineRegistry()
+
+
 # --- SQLAlchemy engine for LangChain / SQL tools ---
-def get_engine():
-    # SAME DSN + SAME connect_args everywhere
-    return create_engine(
-        f"duckdb:///{DB_PATH}",
-        connect_args={"config": CANONICAL_CFG, "read_only": READ_ONLY},
-        pool_pre_ping=True,  # helps detect dead conns
-    )
+def get_engine() -> Engine:
+    """The process-wide engine for the DuckDB file (created on first use)."""
+    return registry.engine()
+
+def read_connection():
+    return registry.reader()
+
+def write_connection():
+    return registry.writer()
+
+def engine_stats() -> dict:
+    return {"files": registry.stats(), "idle_closes": registry.idle_closes}
+
+# --- Per-clinic databases: opened on first use, released when idle ---
+def clinic_engine(clinic_id: str) -> Engine:
+    return registry.engine(clinic_db_path(clinic_id), idle_close=True)
+
+def clinic_read_connection(clinic_id: str):
+    return registry.reader(clinic_db_path(clinic_id), idle_close=True)
+
+def clinic_write_connection(clinic_id: str):
+    """Serialized per clinic: ingestion of different clinics runs in parallel."""
+    return registry.writer(clinic_db_path(clinic_id), idle_close=True)
 
 # --- Raw duckdb connection (only if needed) ---
 _singleton_con = None
@@ -1,4 +1,5 @@
 # conversations_repo.py
+import base64
 import os
 from dataclasses import dataclass
 from datetime import datetime
@@ -6,7 +7,7 @@ from typing import List, Literal, Optional, Dict, Any
 from Database.db_register import Base
 from sqlalchemy import (
     create_engine, Column, String, DateTime, func, Index, BigInteger,
-    Sequence, ForeignKey, Text
+    Sequence, ForeignKey, Text, CheckConstraint, select, insert, update, tuple_
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.mutable import MutableList
@@ -22,7 +23,9 @@ class ConversationDTO:
     clinic_id: str
     title: str
     created_at: datetime
-    messages: List[Dict[str, Any]]
+    updated_at: Optional[datetime] = None
+    message_count: Optional[int] = None
+    last_activity: Optional[datetime] = None
 
 # ---------- DB setup ----------
 DATABASE_URL = os.getenv(
@@ -40,7 +43,7 @@ class Conversation(Base):
     id = Column(BigInteger, Sequence("conversations_seq"), primary_key=True)
     clinic_id = Column(String(6), ForeignKey("clinics.clinic_id"), nullable=False)
     title = Column(Text, nullable=False, server_default="New conversation")
-    # ✅ store messages as JSONB (list of {"role":..., "content":...})
+    # legacy JSONB history; moved into `messages` by Database/migrate_messages.py, kept empty since
     messages = Column(MutableList.as_mutable(JSONB), nullable=False, default=list)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -48,6 +51,21 @@ class Conversation(Base):
     __table_args__ = (
         Index("idx_conversations_clinic", "clinic_id"),
         Index("idx_conversations_created", "created_at"),
+        Index("idx_conversations_clinic_updated", "clinic_id", "updated_at", "id"),  # sidebar listing
+    )
+
+class Message(Base):
+    __tablename__ = "messages"
+
+    id = Column(BigInteger, Sequence("messages_seq"), primary_key=True)
+    conversation_id = Column(BigInteger, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False)
+    role = Column(String(16), nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("idx_messages_conversation_id", "conversation_id", "id"),
+        CheckConstraint("role IN ('user', 'assistant')", name="ck_messages_role"),
     )
 
 # ---------- Init ----------
@@ -56,6 +74,9 @@ def init_db(max_retries: int = 30, delay_seconds: float = 1.0) -> None:
     for attempt in range(1, max_retries + 1):
         try:
             Base.metadata.create_all(bind=engine)
+            # create_all skips existing tables, so indexes added later are created here
+            for index in Conversation.__table__.indexes:
+                index.create(bind=engine, checkfirst=True)
             return
         except OperationalError:
             if attempt == max_retries:
@@ -63,31 +84,36 @@ def init_db(max_retries: int = 30, delay_seconds: float = 1.0) -> None:
             time.sleep(delay_seconds)
 
 # ---------- CRUD ----------
-def list_messages(conversation_id: int) -> list[dict]:
+def list_messages(conversation_id: int, limit: Optional[int] = None, before: Optional[int] = None) -> list[dict]:
+    """Messages in chronological order.
+
+    With `limit`, returns the newest `limit` messages older than message id
+    `before` (cursor), so pages can be walked backwards from the latest one.
+    """
+    q = select(Message.id, Message.role, Message.content, Message.created_at).where(
+        Message.conversation_id == conversation_id
+    )
+    if before is not None:
+        q = q.where(Message.id < before)
+    if limit is not None:
+        q = q.order_by(Message.id.desc()).limit(limit)
+    else:
+        q = q.order_by(Message.id.asc())
+
     with SessionLocal() as session:
-        row = (
-            session.query(
-                Conversation.id,
-                Conversation.messages,
-                Conversation.created_at,
-            )
-            .filter(Conversation.id == conversation_id)
-            .one_or_none()
-        )
-        if not row:
-            return []
-
-        msgs = row.messages or []
-        return [
-            {
-                "id": i,  # synthetic index
-                "conversation_id": conversation_id,
-                "role": m.get("role"),
-                "content": m.get("content", ""),
-                "created_at": row.created_at,
-            }
-            for i, m in enumerate(msgs, start=1)
-        ]
+        rows = session.execute(q).all()
+    if limit is not None:
+        rows.reverse()
+    return [
+        {
+            "id": r.id,
+            "conversation_id": conversation_id,
+            "role": r.role,
+            "content": r.content,
+            "created_at": r.created_at,
+        }
+        for r in rows
+    ]
 
 def create_conversation(clinic_id: str, title: str = "New conversation") -> int:
     safe_title = (title or "").strip() or "New conversation"
@@ -97,29 +123,86 @@ def create_conversation(clinic_id: str, title: str = "New conversation") -> int:
         session.flush()  # assigns PK
         return obj.id
 
-def list_conversations(clinic_id: str) -> List[ConversationDTO]:
+def encode_cursor(conv: ConversationDTO) -> str:
+    """Opaque keyset cursor pointing just past conv in list_conversations order."""
+    raw = f"{conv.updated_at.isoformat()}|{conv.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError for anything else."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        updated_at, conv_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(updated_at), int(conv_id)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
+
+def list_conversations(
+    clinic_id: str,
+    limit: Optional[int] = None,
+    before: Optional[str] = None,
+    with_stats: bool = False,
+) -> List[ConversationDTO]:
+    """Conversations of a clinic, most recently updated first.
+
+    Only the listing columns are read (never message bodies), walking
+    idx_conversations_clinic_updated. `before` is a cursor from encode_cursor;
+    with_stats adds message_count and last_activity, computed in SQL.
+    """
+    columns = [
+        Conversation.id,
+        Conversation.clinic_id,
+        Conversation.title,
+        Conversation.created_at,
+        Conversation.updated_at,
+    ]
+    if with_stats:
+        columns += [
+            select(func.count(Message.id))
+            .where(Message.conversation_id == Conversation.id)
+            .scalar_subquery()
+            .label("message_count"),
+            select(func.max(Message.created_at))
+            .where(Message.conversation_id == Conversation.id)
+            .scalar_subquery()
+            .label("last_activity"),
+        ]
+    q = (
+        select(*columns)
+        .where(Conversation.clinic_id == clinic_id)
+        .order_by(Conversation.updated_at.desc(), Conversation.id.desc())
+    )
+    if before is not None:
+        updated_at, conv_id = decode_cursor(before)
+        q = q.where(tuple_(Conversation.updated_at, Conversation.id) < (updated_at, conv_id))
+    if limit is not None:
+        q = q.limit(limit)
+
     with SessionLocal() as session:
-        rows = (
-            session.query(Conversation)
-            .filter(Conversation.clinic_id == clinic_id)
-            .order_by(Conversation.updated_at.desc())
-            .all()
+        rows = session.execute(q).all()
+    return [
+        ConversationDTO(
+            id=r.id,
+            clinic_id=r.clinic_id,
+            title=r.title,
+            created_at=r.created_at,
+            updated_at=r.updated_at,
+            message_count=r.message_count if with_stats else None,
+            last_activity=r.last_activity if with_stats else None,
         )
-        return [
-            ConversationDTO(
-                id=r.id,
-                clinic_id=r.clinic_id,
-                title=r.title,
-                created_at=r.created_at,
-                messages=r.messages or [],
-            )
-            for r in rows
-        ]
+        for r in rows
+    ]
 
 def get_conversation(conversation_id: int, clinic_id: str) -> Optional[ConversationDTO]:
     with SessionLocal() as session:
         r = (
-            session.query(Conversation)
+            session.query(
+                Conversation.id,
+                Conversation.clinic_id,
+                Conversation.title,
+                Conversation.created_at,
+                Conversation.updated_at,
+            )
             .filter(Conversation.id == conversation_id, Conversation.clinic_id == clinic_id)
             .one_or_none()
         )
@@ -130,7 +213,7 @@ def get_conversation(conversation_id: int, clinic_id: str) -> Optional[Conversat
             clinic_id=r.clinic_id,
             title=r.title,
             created_at=r.created_at,
-            messages=r.messages or [],
+            updated_at=r.updated_at,
         )
 
 def rename_conversation(conversation_id: int, clinic_id: str, new_title: str) -> None:
@@ -151,20 +234,26 @@ def delete_conversation(conversation_id: int, clinic_id: str) -> None:
             Conversation.clinic_id == clinic_id
         ).delete()
 
-def add_message(conversation_id: int, clinic_id: str, role: Role, content: str) -> None:
+def add_message(conversation_id: int, clinic_id: str, role: Role, content: str) -> Optional[int]:
+    """Append one message (single-row insert); returns its id, or None if the
+    conversation does not exist or belongs to another clinic."""
     if role not in ("user", "assistant"):
         raise ValueError("role must be 'user' or 'assistant'")
     with SessionLocal.begin() as session:
-        r = (
-            session.query(Conversation)
-            .filter(Conversation.id == conversation_id, Conversation.clinic_id == clinic_id)
-            .one_or_none()
-        )
-        if not r:
-            return
-        msgs = r.messages or []
-        msgs.append({"role": role, "content": content})
-        r.messages = msgs  # reassign to mark dirty (MutableList also tracks append)
+        # touching updated_at doubles as the ownership check
+        owned = session.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id, Conversation.clinic_id == clinic_id)
+            .values(updated_at=func.now())
+            .returning(Conversation.id)
+        ).scalar_one_or_none()
+        if owned is None:
+            return None
+        return session.execute(
+            insert(Message)
+            .values(conversation_id=conversation_id, role=role, content=content)
+            .returning(Message.id)
+        ).scalar_one()
 
 def title_from_text(text: str, max_words: int = 8) -> str:
     words = (text or "").strip().split()
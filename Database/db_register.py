@@ -64,16 +64,24 @@ class Clinic(Base):
             session.close()
 
     @staticmethod
-    def authenticate(clinic_email: str, password_plain: str) -> bool:
-        session = SessionLocal()
+    def get_identity(clinic_email: str, with_password_hash: bool = False) -> Optional[tuple]:
+        """(clinic_id, name) for an email in one query, or None.
+        With with_password_hash=True: (clinic_id, name, password_hash), for login."""
+        session  = SessionLocal()
         try:
-            clinic = session.query(Clinic).filter(Clinic.email == clinic_email).first()
-            if clinic and verify_secret(password_plain, clinic.password_hash):
-                return True
-            return False
+            columns = [Clinic.clinic_id, Clinic.name]
+            if with_password_hash:
+                columns.append(Clinic.password_hash)
+            row = session.query(*columns).filter(Clinic.email == clinic_email).first()
+            return tuple(row) if row else None
         finally:
             session.close()
 
+    @staticmethod
+    def authenticate(clinic_email: str, password_plain: str) -> bool:
+        creds = Clinic.get_identity(clinic_email, with_password_hash=True)
+        return bool(creds) and verify_secret(password_plain, creds[2])
+
 def init_db(max_retries: int = 30, delay_seconds: float = 1.0):
     # wait for DB to be truly reachable
     for attempt in range(1, max_retries + 1):
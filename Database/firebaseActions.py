@@ -1,16 +1,23 @@
+import os
 from datetime import timedelta
 import firebase_admin
 from firebase_admin import credentials, storage
 from datetime import timezone
 from zoneinfo import ZoneInfo
+from Database.blobDownload import LocalDirBucket, download_blobs
 
+# Point at a local folder instead of Firebase (tests / offline development)
+LOCAL_BUCKET_DIR = os.getenv("LOCAL_BUCKET_DIR")
 
-cred = credentials.Certificate("serviceAccountKey.json")
-firebase_admin.initialize_app(cred, {
-    'storageBucket': 'techfestproj.firebasestorage.app'
-})
+if LOCAL_BUCKET_DIR:
+    bucket = LocalDirBucket(LOCAL_BUCKET_DIR)
+else:
+    cred = credentials.Certificate("serviceAccountKey.json")
+    firebase_admin.initialize_app(cred, {
+        'storageBucket': 'techfestproj.firebasestorage.app'
+    })
 
-bucket = storage.bucket()
+    bucket = storage.bucket()
 
 def upload_to_firebase(id, file):
     blob = bucket.blob(f"{id}/{file.filename}")
@@ -24,11 +31,14 @@ def get_download_url(id, file_name):
     blob = bucket.blob(f"{id}/{file_name}")
     return blob.generate_signed_url(version="v4", expiration=timedelta(minutes=15), method="GET")
 
-def download_all_from_firebase(id, local_dir):
-    blobs = bucket.list_blobs(prefix=f"{id}/")
-    for blob in blobs:
-        file_name = blob.name.split('/')[-1]
-        blob.download_to_filename(f"{local_dir}/{file_name}")
+def list_clinic_blobs(id):
+    return list(bucket.list_blobs(prefix=f"{id}/"))
+
+def download_all_from_firebase(id, local_dir, workers=None):
+    results = download_blobs(list_clinic_blobs(id), local_dir, workers=workers)
+    for r in results:
+        print(f"Downloaded {r.name} ({r.size} B) in {r.seconds:.2f}s, attempts={r.attempts}")
+    return results
 
 def list_files_from_firebase(id):
     blobs_iter = bucket.list_blobs(prefix=f"{id}/")
@@ -1,14 +1,23 @@
 # Database/firebaseIngest.py
+import codecs
 import duckdb
+import json
+import os
 import pandas as pd
+from dataclasses import dataclass, field
 from pathlib import Path
-import shutil
 import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
 from sqlalchemy.engine import Connection  # optional: for typing
 from sqlalchemy import text
-from Database.db import get_engine
+from Database.db import clinic_read_connection, clinic_write_connection
+from Database.sql_utils import quote_identifier, quote_literal
 
-from Database.firebaseActions import download_all_from_firebase
+from Database.blobDownload import download_blobs
+from Database.firebaseActions import list_clinic_blobs
 
 # project root = parent of Database/
 ROOT_DIR = Path(__file__).resolve().parent.parent
@@ -19,6 +28,13 @@ DB.parent.mkdir(parents=True, exist_ok=True)
 CSV_DIR = Path(__file__).resolve().parent / "clinicCSV"
 CSV_DIR.mkdir(parents=True, exist_ok=True)
 
+# Columnar copies of the CSVs: <PARQUET_DIR>/<clinic_id>/<table>-<token>.parquet.
+# Clinic tables are views over these files; the CSV is deleted once converted.
+# Manifests store only the file names, so views are re-pointed when the root moves.
+PARQUET_DIR = Path(os.getenv("PARQUET_DIR", ROOT_DIR / "data" / "parquet")).resolve()
+PARQUET_DIR.mkdir(parents=True, exist_ok=True)
+PARQUET_OPTIONS = "FORMAT parquet, COMPRESSION zstd, ROW_GROUP_SIZE 122880"
+
 # -------- utils --------
 _SNAKE = re.compile(r"[^0-9a-zA-Z]+")
 def _to_snake(s: str) -> str:
@@ -30,24 +46,49 @@ def _to_snake(s: str) -> str:
         s = "_" + s
     return s
 
-def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+def _normalize_names(columns) -> List[str]:
     seen, new_cols = {}, []
-    for c in df.columns:
+    for c in columns:
         base = _to_snake(str(c))
         name, i = base, 2
         while name in seen:
             name = f"{base}_{i}"; i += 1
         seen[name] = True
         new_cols.append(name)
-    df.columns = new_cols
+    return new_cols
+
+def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df.columns = _normalize_names(df.columns)
     return df
 
-def _quote_identifier(ident: str) -> str:
-    return '"' + ident.replace('"', '""') + '"'
+def _is_blank_file(csv_path: Path) -> bool:
+    """True when pandas would raise EmptyDataError (no bytes or only whitespace)."""
+    with open(csv_path, "rb") as f:
+        while chunk := f.read(1 << 16):
+            if chunk.strip():
+                return False
+    return True
 
-def _table_name_for(clinic_id: str, csv_path: Path) -> str:
-    return f"{clinic_id}_{csv_path.stem}"
+def _detect_encoding(csv_path: Path) -> str:
+    """'utf-8' when the whole file decodes as UTF-8, else the latin-1 fallback.
+
+    Decodes incrementally so memory stays bounded; a failing statement would
+    abort the surrounding DuckDB transaction, so we decide before reading.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with open(csv_path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                decoder.decode(chunk)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return "latin-1"
+    return "utf-8"
+
+def _table_name_for(csv_path: Path) -> str:
+    # tables live in the clinic's own database file, so no clinic prefix is needed
+    return csv_path.stem
 
 # def _ingest_one(con: duckdb.DuckDBPyConnection, table_name: str, csv_path: Path) -> int:
 #     try:
@@ -55,11 +96,11 @@ def _table_name_for(clinic_id: str, csv_path: Path) -> str:
 #     except UnicodeDecodeError:
 #         df = pd.read_csv(csv_path, encoding="latin-1")
 #     except pd.errors.EmptyDataError:
-#         qname = _quote_identifier(table_name)
+#         qname = quote_identifier(table_name)
 #         con.execute(f"CREATE OR REPLACE TABLE {qname} AS SELECT NULL AS _empty WHERE 1=0;")
 #         return 0
 
-#     qname = _quote_identifier(table_name)
+#     qname = quote_identifier(table_name)
 #     if df.empty:
 #         df = _normalize_columns(df)
 #         con.register("df0", df.head(0))
@@ -73,81 +114,311 @@ def _table_name_for(clinic_id: str, csv_path: Path) -> str:
 #     con.unregister("df")
 #     return int(con.execute(f"SELECT COUNT(*) FROM {qname};").fetchone()[0])
 
-def _ingest_one(con: "Connection", table_name: str, csv_path: Path) -> int:
-    """Ingest a single CSV into DuckDB using a SQLAlchemy Connection.
+def _parquet_path(clinic_id: str, file_name: str) -> Path:
+    return PARQUET_DIR / clinic_id / file_name
+
+def _drop_relation(con: "Connection", name: str) -> None:
+    """Drop a table or view (tables predate the Parquet cache)."""
+    kind = con.exec_driver_sql(
+        "SELECT table_type FROM information_schema.tables WHERE table_schema = 'main' AND table_name = ?",
+        (name,),
+    ).scalar()
+    if kind == "VIEW":
+        con.exec_driver_sql(f"DROP VIEW IF EXISTS {quote_identifier(name)};")
+    elif kind is not None:
+        con.exec_driver_sql(f"DROP TABLE IF EXISTS {quote_identifier(name)};")
+
+def _view_body(parquet: Optional[Path]) -> str:
+    if parquet is None:  # blank CSV: keep the historical empty shape
+        return "SELECT NULL AS _empty WHERE 1=0"
+    return f"SELECT * FROM read_parquet({quote_literal(str(parquet))})"
+
+def _create_view(con: "Connection", table_name: str, parquet: Optional[Path]) -> None:
+    _drop_relation(con, table_name)
+    con.exec_driver_sql(f"CREATE VIEW {quote_identifier(table_name)} AS {_view_body(parquet)};")
+
+def _ingest_one(con: "Connection", clinic_id: str, table_name: str, csv_path: Path) -> Dict[str, Any]:
+    """Convert a single CSV to Parquet with DuckDB's native reader and expose it as a view.
 
     - Normalizes column names to snake_case (stable & unique)
-    - Replaces the table if it exists
-    - Returns row count written
+    - Writes a new zstd Parquet file (row groups carry min/max statistics, so
+      range filters skip whole row groups) and points the view at it; the
+      previous file stays valid until the caller's transaction commits
+    - Returns {"rows", "parquet"} for the manifest ("parquet" is None for blank files)
     """
-    qname = _quote_identifier(table_name)
+    # 1) No header at all -> explicit empty view (match previous behavior)
+    if _is_blank_file(csv_path):
+        _create_view(con, table_name, None)
+        return {"rows": 0, "parquet": None}
 
-    # 1) Read CSV with fallback encoding
-    try:
-        df = pd.read_csv(csv_path)
-    except UnicodeDecodeError:
-        df = pd.read_csv(csv_path, encoding="latin-1")
-    except pd.errors.EmptyDataError:
-        # Create an explicit empty table (match previous behavior)
-        con.exec_driver_sql(f"""
-            CREATE OR REPLACE TABLE {qname}
-            AS SELECT NULL AS _empty WHERE 1=0;
-        """)
-        return 0
+    # 2) Read CSV with fallback encoding; header-only files give 0 rows
+    source = (
+        f"read_csv({quote_literal(str(csv_path))}, header = true, "
+        f"encoding = {quote_literal(_detect_encoding(csv_path))})"
+    )
 
-    # 2) Normalize columns (even for empty df with headers)
-    df = _normalize_columns(df)
-
-    # 3) If empty -> create empty schema only (0 rows)
-    if df.empty:
-        # head(0) preserves schema without rows
-        df.head(0).to_sql(
-            name=table_name,
-            con=con,               # SQLAlchemy Connection/Engine works
-            if_exists="replace",
-            index=False,
+    # 3) Normalize columns by projecting the sniffed names onto snake_case
+    described = con.exec_driver_sql(f"DESCRIBE SELECT * FROM {source};").fetchall()
+    originals = [row[0] for row in described]
+    projection = ", ".join(
+        f"{quote_identifier(old)} AS {quote_identifier(new)}"
+        for old, new in zip(originals, _normalize_names(originals))
+    )
+
+    # 4) Write a fresh file, then repoint the view
+    file_name = f"{table_name}-{uuid.uuid4().hex[:12]}.parquet"
+    parquet = _parquet_path(clinic_id, file_name)
+    parquet.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        con.exec_driver_sql(
+            f"COPY (SELECT {projection} FROM {source}) TO {quote_literal(str(parquet))} ({PARQUET_OPTIONS});"
         )
+        count = con.exec_driver_sql(f"SELECT COUNT(*) FROM read_parquet({quote_literal(str(parquet))});").scalar()
+        _create_view(con, table_name, parquet)
+    except Exception:
+        parquet.unlink(missing_ok=True)  # no view will ever point at it
+        raise
+    return {"rows": int(count), "parquet": file_name}
+
+# -------- manifest --------
+# One JSON file per clinic: <MANIFEST_DIR>/<clinic_id>.json
+# {"version": <int>, "listed_at": <unix time of the last completed listing>,
+#  "files": {<blob name>: {"generation", "md5", "table", "rows", "parquet"}}}
+MANIFEST_DIR = Path(os.getenv("MANIFEST_DIR", ROOT_DIR / "data" / "manifests")).resolve()
+MANIFEST_DIR.mkdir(parents=True, exist_ok=True)
+
+# clinic_id -> (manifest mtime_ns, version): version lookups cost a stat, not a JSON parse
+_versions: Dict[str, tuple] = {}
+
+_locks_guard = threading.Lock()
+_clinic_locks: dict[str, threading.Lock] = {}
+
+@dataclass
+class IngestSummary:
+    clinic_id: str
+    version: int
+    added: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    rows: int = 0
+    views_rebuilt: bool = False  # catalog was out of line with the manifest and was rebuilt from Parquet
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+def _clinic_lock(clinic_id: str) -> threading.Lock:
+    with _locks_guard:
+        lock = _clinic_locks.get(clinic_id)
+        if lock is None:
+            lock = _clinic_locks[clinic_id] = threading.Lock()
+        return lock
+
+def _manifest_path(clinic_id: str) -> Path:
+    return MANIFEST_DIR / f"{clinic_id}.json"
+
+def load_manifest(clinic_id: str) -> Dict[str, Any]:
+    path = _manifest_path(clinic_id)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {"version": 0, "files": {}}
+    manifest.setdefault("version", 0)
+    manifest.setdefault("files", {})
+    return manifest
+
+def _save_manifest(clinic_id: str, manifest: Dict[str, Any]) -> None:
+    path = _manifest_path(clinic_id)
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)  # atomic on POSIX and Windows
+    _versions[clinic_id] = (path.stat().st_mtime_ns, int(manifest["version"]))
+
+def get_data_version(clinic_id: str) -> int:
+    """Monotonic counter bumped every time the clinic's tables change.
+
+    Kept in memory and updated by _save_manifest; the manifest is only re-read
+    when its mtime shows another process (e.g. another worker's ingest) wrote it.
+    """
+    try:
+        mtime = _manifest_path(clinic_id).stat().st_mtime_ns
+    except FileNotFoundError:
         return 0
+    cached = _versions.get(clinic_id)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    version = int(load_manifest(clinic_id)["version"])
+    _versions[clinic_id] = (mtime, version)
+    return version
 
-    # 4) Write full table (replace)
-    df.to_sql(
-        name=table_name,
-        con=con,
-        if_exists="replace",
-        index=False,
-    )
+def has_been_listed(clinic_id: str) -> bool:
+    """True once an ingest has listed the clinic's bucket folder, even if it was empty."""
+    manifest = load_manifest(clinic_id)
+    return int(manifest["version"]) > 0 or "listed_at" in manifest
+
+def _blob_file_name(blob) -> str:
+    return blob.name.split("/")[-1]
 
-    # 5) Count rows
-    count = con.exec_driver_sql(f"SELECT COUNT(*) FROM {qname};").scalar()
-    return int(count)
+def _fingerprint(blob) -> Dict[str, Any]:
+    return {"generation": blob.generation, "md5": blob.md5_hash}
 
 # -------- main ingest -------- this is used after the person uploads their CSV
-def ingest_clinic_from_firebase(clinic_id: str) -> None:
-    clinic_dir = CSV_DIR / clinic_id
-    if clinic_dir.exists():
-        shutil.rmtree(clinic_dir)
-    clinic_dir.mkdir(parents=True, exist_ok=True)
+def ingest_clinic_from_firebase(clinic_id: str) -> IngestSummary:
+    """Bring the clinic's DuckDB tables in line with its bucket folder.
 
-    download_all_from_firebase(clinic_id, clinic_dir)
+    Only blobs whose generation/MD5 differ from the manifest are downloaded and
+    re-ingested; blobs that disappeared have their tables dropped. When nothing
+    changed this costs a single listing call and touches no DuckDB state.
+    """
+    with _clinic_lock(clinic_id):
+        blobs = {
+            b.name: b for b in list_clinic_blobs(clinic_id)
+            if b.name.lower().endswith(".csv")
+        }
+        manifest = load_manifest(clinic_id)
+        files = manifest["files"]
+        summary = IngestSummary(clinic_id=clinic_id, version=int(manifest["version"]))
+        summary.views_rebuilt = _ensure_views(clinic_id, manifest)
+
+        changed = []
+        for name, blob in sorted(blobs.items()):
+            entry = files.get(name)
+            if entry and all(entry.get(k) == v for k, v in _fingerprint(blob).items()):
+                summary.unchanged += 1
+            else:
+                changed.append(blob)
+        removed = sorted(name for name in files if name not in blobs)
+
+        if not changed and not removed:
+            if "listed_at" not in manifest:  # e.g. a clinic with no uploads yet
+                manifest["listed_at"] = time.time()
+                _save_manifest(clinic_id, manifest)
+            return summary
 
-    csvs = sorted(p for p in clinic_dir.iterdir() if p.suffix.lower() == ".csv")
-    if not csvs:
-        print(f"No CSV files for clinic '{clinic_id}'.")
-        return
+        clinic_dir = CSV_DIR / clinic_id
+        clinic_dir.mkdir(parents=True, exist_ok=True)
+        for r in download_blobs(changed, clinic_dir):
+            print(f"Downloaded {r.name} ({r.size} B) in {r.seconds:.2f}s, attempts={r.attempts}")
 
-    engine = get_engine()
-    with engine.connect() as con:
+        superseded = []  # Parquet files to delete once the new views are committed
+        written = []  # new Parquet files, deleted again if the transaction does not commit
+        # per-clinic writer: ingests of different clinics no longer queue behind each other
         try:
-            for csv_path in csvs:
-                tname = _table_name_for(clinic_id, csv_path)
-                rows = _ingest_one(con, tname, csv_path)
-                print(f"Ingested {rows} rows into table: {tname}")
-        finally:
-            #output all table names
-            tables = con.exec_driver_sql("SHOW TABLES").fetchall()
-            print("Tables in DB:")
-            for (t,) in tables:
-                print(f"- {t}")
+            with clinic_write_connection(clinic_id) as con:
+                for name in removed:
+                    entry = files.pop(name)
+                    _drop_relation(con, entry["table"])
+                    superseded.append(entry.get("parquet"))
+                    summary.removed.append(name)
+                    print(f"Dropped table: {entry['table']}")
+
+                for blob in changed:
+                    csv_path = clinic_dir / _blob_file_name(blob)
+                    tname = _table_name_for(csv_path)
+                    result = _ingest_one(con, clinic_id, tname, csv_path)
+                    written.append(result["parquet"])
+                    if blob.name in files:
+                        superseded.append(files[blob.name].get("parquet"))
+                        summary.updated.append(blob.name)
+                    else:
+                        summary.added.append(blob.name)
+                    files[blob.name] = {**_fingerprint(blob), "table": tname, **result}
+                    summary.rows += result["rows"]
+                    print(f"Ingested {result['rows']} rows into table: {tname}")
+        except Exception:
+            for file_name in filter(None, written):
+                _parquet_path(clinic_id, file_name).unlink(missing_ok=True)
+            raise
+
+        manifest["version"] = summary.version = summary.version + 1
+        manifest["listed_at"] = time.time()
+        _save_manifest(clinic_id, manifest)
+        for blob in changed:
+            (clinic_dir / _blob_file_name(blob)).unlink(missing_ok=True)
+        for file_name in filter(None, superseded):
+            _parquet_path(clinic_id, file_name).unlink(missing_ok=True)
+        return summary
+
+def _entry_parquet(clinic_id: str, entry: Dict[str, Any]) -> Optional[Path]:
+    return _parquet_path(clinic_id, entry["parquet"]) if entry["parquet"] else None
+
+def _views_stale(con: "Connection", clinic_id: str, manifest: Dict[str, Any]) -> bool:
+    """True when a manifest table is missing from the catalog (e.g. the database file
+    was recreated empty), reads a file other than its cached Parquet (PARQUET_DIR
+    moved), or predates the Parquet cache."""
+    views = dict(con.exec_driver_sql(
+        "SELECT view_name, sql FROM duckdb_views() WHERE NOT internal AND schema_name = 'main'"
+    ).fetchall())
+    for entry in manifest["files"].values():
+        if "parquet" not in entry:
+            return True
+        sql = views.get(entry["table"])
+        if sql is None:
+            return True
+        if entry["parquet"] and quote_literal(str(_entry_parquet(clinic_id, entry))) not in sql:
+            return True
+    return False
+
+def _ensure_views(clinic_id: str, manifest: Dict[str, Any]) -> bool:
+    if not manifest["files"]:
+        return False
+    with clinic_read_connection(clinic_id) as con:
+        if not _views_stale(con, clinic_id, manifest):
+            return False
+    _rebuild_views(clinic_id, manifest)
+    return True
+
+def _rebuild_views(clinic_id: str, manifest: Dict[str, Any]) -> int:
+    files = manifest["files"]
+    dirty = False
+    exported = []  # Parquet files written here, deleted again if the rebuild fails
+    try:
+        with clinic_write_connection(clinic_id) as con:
+            for name, entry in list(files.items()):
+                tname = entry["table"]
+                if "parquet" not in entry:  # ingested before the Parquet cache
+                    exists = con.exec_driver_sql(
+                        "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = 'main' AND table_name = ?",
+                        (tname,),
+                    ).scalar()
+                    if not exists:  # nothing to export: forget it so the next ingest downloads it again
+                        files.pop(name)
+                        dirty = True
+                        continue
+                    file_name = f"{tname}-{uuid.uuid4().hex[:12]}.parquet"
+                    parquet = _parquet_path(clinic_id, file_name)
+                    parquet.parent.mkdir(parents=True, exist_ok=True)
+                    exported.append(parquet)
+                    con.exec_driver_sql(
+                        f"COPY {quote_identifier(tname)} TO {quote_literal(str(parquet))} ({PARQUET_OPTIONS});"
+                    )
+                    entry["parquet"] = file_name
+                    dirty = True
+                _create_view(con, tname, _entry_parquet(clinic_id, entry))
+    except Exception:
+        for parquet in exported:
+            parquet.unlink(missing_ok=True)
+        raise
+    if dirty:
+        _save_manifest(clinic_id, manifest)
+    return len(files)
+
+def ensure_clinic_views(clinic_id: str) -> bool:
+    """Rebuild the clinic's views from cached Parquet if its catalog no longer
+    matches the manifest; cheap (one catalog query) when it does. Returns True
+    when views were rebuilt."""
+    with _clinic_lock(clinic_id):
+        return _ensure_views(clinic_id, load_manifest(clinic_id))
+
+def rebuild_clinic_views(clinic_id: str) -> int:
+    """Recreate the clinic's views from its manifest and cached Parquet files,
+    without touching the bucket. Tables ingested before the Parquet cache are
+    exported once and replaced by views. Returns the number of views."""
+    with _clinic_lock(clinic_id):
+        return _rebuild_views(clinic_id, load_manifest(clinic_id))
 
 if __name__ == "__main__":
     ingest_clinic_from_firebase("test_id")
@@ -0,0 +1,52 @@
+# Moves base64 images/audio inlined in stored messages into the artifact store,
+# leaving /api/artifacts/<hash> references behind, and records each message's
+# clinic as an owner of the artifacts (and speech) it references. Safe to re-run.
+import re
+
+from sqlalchemy import or_, select, update
+
+from Backend.services.artifact_store import artifacts, externalize_data_uris
+from Backend.services.tts_service import speech_artifact
+from Database.db_history import Conversation, Message, SessionLocal
+
+_ARTIFACT_REF = re.compile(r"/api/artifacts/([0-9a-f]{64})")
+_SPEECH_REF = re.compile(r"/api/tts/([0-9a-f]{64})")
+
+
+def _grant_references(content: str, clinic_id: str) -> None:
+    digests = [d for d in _ARTIFACT_REF.findall(content) if artifacts.exists(d)]
+    digests += [d for d in map(speech_artifact, _SPEECH_REF.findall(content)) if d]
+    for digest in digests:
+        artifacts.grant(digest, clinic_id)
+
+
+def migrate_artifacts(batch_size: int = 100) -> int:
+    """Rewrite messages that still embed data URIs; returns the number rewritten."""
+    rewritten, last_id = 0, 0
+    while True:
+        with SessionLocal.begin() as session:
+            rows = session.execute(
+                select(Message.id, Message.content, Conversation.clinic_id)
+                .join(Conversation, Conversation.id == Message.conversation_id)
+                .where(Message.id > last_id, or_(
+                    Message.content.contains(";base64,"),
+                    Message.content.contains("/api/artifacts/"),
+                    Message.content.contains("/api/tts/"),
+                ))
+                .order_by(Message.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return rewritten
+            for msg_id, content, clinic_id in rows:
+                new_content = externalize_data_uris(content, clinic_id)
+                if new_content != content:
+                    session.execute(update(Message).where(Message.id == msg_id).values(content=new_content))
+                    rewritten += 1
+                _grant_references(new_content, clinic_id)
+            last_id = rows[-1].id
+        print(f"Rewrote {rewritten} messages so far")
+
+
+if __name__ == "__main__":
+    print(f"Rewrote {migrate_artifacts()} messages")
@@ -0,0 +1,43 @@
+# Moves legacy JSONB conversation histories into the `messages` table.
+# Idempotent: each migrated conversation has its JSONB array emptied in the
+# same transaction, so re-running only picks up what is left.
+# Run once after deploying the messages table: python -m Database.migrate_messages
+from sqlalchemy import func, insert, select, update
+
+from Database.db_history import Conversation, Message, SessionLocal, init_db
+
+
+def migrate_messages(batch_size: int = 100) -> int:
+    """Migrate every conversation still holding JSONB messages; returns the number of messages moved."""
+    init_db()
+    moved = 0
+    while True:
+        with SessionLocal.begin() as session:
+            rows = session.execute(
+                select(Conversation.id, Conversation.messages, Conversation.created_at)
+                .where(func.jsonb_array_length(Conversation.messages) > 0)
+                .order_by(Conversation.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not rows:
+                return moved
+            for conv_id, legacy, created_at in rows:
+                # per-message times were never stored; keep array order via ascending ids
+                values = [
+                    {
+                        "conversation_id": conv_id,
+                        "role": m.get("role") if m.get("role") in ("user", "assistant") else "assistant",
+                        "content": m.get("content") or "",
+                        "created_at": created_at,
+                    }
+                    for m in legacy
+                ]
+                session.execute(insert(Message), values)
+                session.execute(update(Conversation).where(Conversation.id == conv_id).values(messages=[], updated_at=Conversation.updated_at))
+                moved += len(values)
+        print(f"Migrated {moved} messages so far")
+
+
+if __name__ == "__main__":
+    print(f"Migrated {migrate_messages()} messages")
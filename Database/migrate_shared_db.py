@@ -0,0 +1,86 @@
+# Splits the legacy shared DuckDB file (data/mydb.duckdb, tables named
+# "<clinic_id>_<stem>") into one database per clinic (data/clinics/<clinic_id>.duckdb,
+# tables named "<stem>"). Idempotent: tables are copied with CREATE OR REPLACE
+# and manifests are only rewritten when a table name actually changes.
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import duckdb
+
+from Database.db import DB_PATH, clinic_write_connection
+from Database.firebaseIngest import MANIFEST_DIR, _save_manifest, load_manifest, rebuild_clinic_views
+from Database.sql_utils import quote_identifier
+
+_PREFIXED = re.compile(r"^([0-9a-f]{6})_(.+)$")
+
+
+def _plan(shared_tables: List[str]) -> Dict[str, List[Tuple[str, str]]]:
+    """clinic_id -> [(shared table, new table)], from the manifests first, then the name prefix."""
+    plan: Dict[str, List[Tuple[str, str]]] = {}
+    claimed = set()
+    for path in sorted(MANIFEST_DIR.glob("*.json")):
+        clinic_id = path.stem
+        for entry in load_manifest(clinic_id)["files"].values():
+            table = entry.get("table", "")
+            prefix = f"{clinic_id}_"
+            if table in shared_tables and table.startswith(prefix):
+                plan.setdefault(clinic_id, []).append((table, table[len(prefix):]))
+                claimed.add(table)
+    for table in shared_tables:
+        m = _PREFIXED.match(table)
+        if table not in claimed and m:
+            plan.setdefault(m.group(1), []).append((table, m.group(2)))
+    return plan
+
+
+def _rename_in_manifest(clinic_id: str, renames: Dict[str, str]) -> None:
+    manifest = load_manifest(clinic_id)
+    changed = False
+    for entry in manifest["files"].values():
+        if entry.get("table") in renames:
+            entry["table"] = renames[entry["table"]]
+            changed = True
+    if changed:
+        manifest["version"] = int(manifest["version"]) + 1  # cached schemas/results refer to old names
+        _save_manifest(clinic_id, manifest)
+
+
+def migrate_shared_db(drop: bool = False) -> int:
+    """Copy every clinic's tables out of the shared file; returns the number of tables copied."""
+    if not Path(DB_PATH).exists():
+        return 0
+    with duckdb.connect(DB_PATH, read_only=True) as shared:
+        shared_tables = [t for (t,) in shared.execute(
+            "SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'"
+        ).fetchall()]
+
+    plan = _plan(shared_tables)
+    copied = 0
+    for clinic_id, tables in sorted(plan.items()):
+        with clinic_write_connection(clinic_id) as con:
+            con.exec_driver_sql(f"ATTACH '{DB_PATH}' AS shared (READ_ONLY)")
+            try:
+                for old, new in tables:
+                    con.exec_driver_sql(
+                        f"CREATE OR REPLACE TABLE {quote_identifier(new)} AS "
+                        f"SELECT * FROM shared.main.{quote_identifier(old)}"
+                    )
+                    copied += 1
+                    print(f"{clinic_id}: {old} -> {new}")
+            finally:
+                con.exec_driver_sql("DETACH shared")
+        _rename_in_manifest(clinic_id, dict(tables))
+        rebuild_clinic_views(clinic_id)  # manifest-tracked tables become Parquet-backed views
+
+    if drop and copied:
+        with duckdb.connect(DB_PATH) as shared:
+            for tables in plan.values():
+                for old, _ in tables:
+                    shared.execute(f"DROP TABLE IF EXISTS {quote_identifier(old)}")
+    return copied
+
+
+if __name__ == "__main__":
+    print(f"Copied {migrate_shared_db(drop='--drop' in sys.argv[1:])} tables")
@@ -0,0 +1,26 @@
+# Small SQL text and value helpers shared by ingestion and the query services.
+import datetime
+import decimal
+import uuid
+from typing import Any
+
+
+def quote_identifier(ident: str) -> str:
+    return '"' + ident.replace('"', '""') + '"'
+
+
+def quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def jsonable(value: Any) -> Any:
+    """A DuckDB result value as something json.dumps accepts."""
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, (bytes, uuid.UUID)):
+        return str(value)
+    return value
@@ -0,0 +1,158 @@
+"""Base dataset ingestion time: row-by-row pipeline vs the vectorized, chunked one.
+
+Compares the old ingestion (whole CSV in one DataFrame, _norm_name /
+_gen_id_from_name / _first_token_until_any_sep mapped over every row,
+duplicates dropped in pandas) with Database/databaseIngest.ingestion
+(CSV read in chunks, normalization once per distinct value, ids and the
+duplicate filter computed by DuckDB), and checks both build the same
+entries table: same columns and types, same rows in the same order.
+
+The CSV is synthetic, shaped like the Kaggle healthcare dataset (55,500 rows)
+and multiplied by each scale, with messy names (odd casing, accents, extra
+whitespace, blanks) and hospitals split by assorted separators:
+
+    python -m benchmarks.bench_databaseIngest --scales 10 100 --legacy-max-scale 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "Database"))  # databaseIngest imports "db"
+import databaseIngest  # noqa: E402
+from databaseIngest import _first_token_until_any_sep, _gen_id_from_name, _norm_name  # noqa: E402
+
+BASE_ROWS = 55_500
+
+_FIRST = ["bobby", "LESLIE", "danny", "andrew", "Adrienne", "emily", "ÉLODIE", "José", "Ştefan", "Zoë", "mihai", "Ana"]
+_LAST = ["JacksOn", "terrY", "smith", "WATTS", "Bell", "Brown", "Núñez", "Popescu", "Müller", "o'brien", "Ionescu", "Lee"]
+_HOSPITALS = ["Sons and Miller", "Kim Inc", "Cook PLC", "Hernandez Rogers and Vang,", "Regina Maria - Policlinica",
+              "Sanador-Centrul", "Spitalul, Sectia 1", "Medlife;Grivita", "  Clinica\tNord", "-Leading Sep", ""]
+
+
+def _block(rng, rows: int, people: int) -> pd.DataFrame:
+    person = rng.integers(0, people, rows)
+    first = np.array(_FIRST, dtype=object)[person % len(_FIRST)]
+    last = np.array(_LAST, dtype=object)[(person // len(_FIRST)) % len(_LAST)]
+    names = pd.Series(first + " " + last + " " + pd.Series(person).astype(str).to_numpy(dtype=object))
+    shouted = rng.random(rows) < 0.01
+    names[shouted] = "  " + names[shouted].str.upper() + "   x "
+    names[rng.random(rows) < 0.001] = "   "
+    names[rng.random(rows) < 0.001] = None
+
+    admission = pd.Timestamp("2019-01-01") + pd.to_timedelta(rng.integers(0, 1800, rows), unit="D")
+    hospitals = np.array(_HOSPITALS, dtype=object)[rng.integers(0, len(_HOSPITALS), rows)]
+    suffix = pd.Series(rng.integers(0, 500, rows)).astype(str).to_numpy(dtype=object)
+    hospitals = np.where(rng.random(rows) < 0.5, hospitals + " " + suffix, suffix + " " + hospitals)
+    return pd.DataFrame({
+        "Name": names,
+        "Age": rng.integers(13, 90, rows),
+        "Gender": np.where(rng.random(rows) < 0.5, "Male", "Female"),
+        "Blood Type": np.array(["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"])[rng.integers(0, 8, rows)],
+        "Medical Condition": np.array(["Cancer", "Obesity", "Diabetes", "Asthma", "Arthritis"])[rng.integers(0, 5, rows)],
+        "Date of Admission": admission.strftime("%Y-%m-%d"),
+        "Doctor": np.array(["Matthew Smith", "Samantha Davies", "Tiffany Mitchell"])[rng.integers(0, 3, rows)],
+        "Hospital": hospitals,
+        "Insurance Provider": np.array(["Blue Cross", "Medicare", "Aetna", "Cigna"])[rng.integers(0, 4, rows)],
+        "Billing Amount": rng.normal(25_000, 14_000, rows).round(6),
+        "Room Number": rng.integers(101, 500, rows),
+        "Admission Type": np.array(["Urgent", "Emergency", "Elective"])[rng.integers(0, 3, rows)],
+        "Discharge Date": (admission + pd.to_timedelta(rng.integers(1, 30, rows), unit="D")).strftime("%Y-%m-%d"),
+        "Medication": np.array(["Paracetamol", "Ibuprofen", "Aspirin", "Penicillin"])[rng.integers(0, 4, rows)],
+        "Test Results": np.array(["Normal", "Abnormal", "Inconclusive"])[rng.integers(0, 3, rows)],
+    })
+
+
+def make_csv(path: Path, rows: int, patients: float = 0.9, seed: int = 0) -> None:
+    """Written one dataset-sized block at a time, so large scales fit in memory.
+    `patients` is the number of distinct patients as a fraction of the rows."""
+    rng = np.random.default_rng(seed)
+    people = max(int(rows * patients), 1)
+    for start in range(0, rows, BASE_ROWS):
+        block = _block(rng, min(BASE_ROWS, rows - start), people)
+        block.to_csv(path, index=False, mode="a" if start else "w", header=not start)
+
+
+def legacy_ingestion(csv_path: Path, db_path: Path) -> None:
+    """Ingestion as it was: one DataFrame, scalar helpers mapped over every row."""
+    df = pd.read_csv(csv_path)
+    df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
+    if "date_of_admission" in df.columns:
+        df["date_of_admission"] = pd.to_datetime(df["date_of_admission"], errors="coerce").dt.date
+    if "discharge_date" in df.columns:
+        df["discharge_date"] = pd.to_datetime(df["discharge_date"], errors="coerce").dt.date
+    if "billing_amount" in df.columns:
+        df["billing_amount"] = pd.to_numeric(df["billing_amount"], errors="coerce")
+
+    disp, key = zip(*df["name"].map(_norm_name))
+    df["patient_name"] = list(disp)
+    df["patient_id"] = [_gen_id_from_name(k) for k in key]
+    df.drop(columns=["name"], inplace=True)
+
+    hospital_first = df["hospital"].map(_first_token_until_any_sep)
+    cdisp, ckey = zip(*hospital_first.map(_norm_name))
+    df["clinic_name"] = list(cdisp)
+    df["clinic_id"] = [_gen_id_from_name(k, length=6) for k in ckey]
+    df.drop(columns=["hospital"], inplace=True)
+
+    counts = df["patient_name"].value_counts(dropna=True)
+    df = df[~df["patient_name"].isin(counts[counts > 1].index)].copy()
+
+    with duckdb.connect(str(db_path)) as con:
+        con.register("df", df)
+        con.execute("DROP TABLE IF EXISTS entries;")
+        con.execute("CREATE TABLE entries AS SELECT * FROM df;")
+
+
+def _table(db_path: Path):
+    with duckdb.connect(str(db_path), read_only=True) as con:
+        schema = [tuple(r[:2]) for r in con.execute("DESCRIBE entries;").fetchall()]
+        rows = con.execute("SELECT * FROM entries;").fetchall()  # insertion order
+    return schema, rows
+
+
+def _timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100], help="multiples of the 55,500-row dataset")
+    parser.add_argument("--legacy-max-scale", type=int, default=100,
+                        help="skip the row-by-row run (and the comparison) above this scale")
+    parser.add_argument("--patients", type=float, default=0.9,
+                        help="distinct patients as a fraction of the rows (the real dataset has ~0.9)")
+    parser.add_argument("--chunk-rows", type=int, default=databaseIngest.CHUNK_ROWS)
+    args = parser.parse_args()
+
+    databaseIngest.print = lambda *a, **k: None  # row counts are printed on every run
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for scale in args.scales:
+            rows = BASE_ROWS * scale
+            csv_path = tmp / f"healthcare_x{scale}.csv"
+            make_csv(csv_path, rows, args.patients)
+            result = {"scale": scale, "rows": rows, "csv MB": round(os.path.getsize(csv_path) / 2**20, 1)}
+
+            new_db = tmp / f"new_x{scale}.duckdb"
+            result["vectorized s"] = round(_timed(databaseIngest.ingestion, csv_path, new_db, args.chunk_rows), 2)
+            if scale <= args.legacy_max_scale:
+                old_db = tmp / f"old_x{scale}.duckdb"
+                result["legacy s"] = round(_timed(legacy_ingestion, csv_path, old_db), 2)
+                result["speedup"] = round(result["legacy s"] / result["vectorized s"], 1)
+                result["identical"] = _table(old_db) == _table(new_db)
+            print(result)
+            for path in tmp.iterdir():
+                path.unlink()
+
+
+if __name__ == "__main__":
+    main()
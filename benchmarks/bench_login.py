@@ -0,0 +1,117 @@
+"""Login throughput and event-loop lag under concurrent load.
+
+Compares the old login path (credential query + bcrypt verify run inline on
+the event loop) with AuthController.login (query in the threadpool, bcrypt
+in the dedicated hashing pool). A ticker coroutine sleeping TICK seconds
+measures how late the loop wakes it up while logins are in flight.
+
+The clinics table is replaced by an in-memory lookup with a simulated query
+latency, so this runs without Postgres:
+
+    python -m benchmarks.bench_login --logins 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from starlette.responses import HTMLResponse, RedirectResponse
+
+from Backend.controllers import auth_controller
+from Backend.controllers.auth_controller import AuthController
+from Backend.core.security import create_clinic_token, hash_secret, verify_secret
+from Database.db_register import Clinic
+
+TICK = 0.005
+EMAIL, PASSWORD = "bench@clinic.test", "bench-password"
+
+
+def _fake_db(query_seconds: float):
+    row = ("abc123", "Bench Clinic", hash_secret(PASSWORD))
+
+    def get_identity(clinic_email: str, with_password_hash: bool = False):
+        time.sleep(query_seconds)  # blocking, like a psycopg2 round trip
+        if clinic_email != EMAIL:
+            return None
+        return row if with_password_hash else row[:2]
+
+    return get_identity
+
+
+async def legacy_login(request: Request):
+    """Login as it was: two blocking queries and bcrypt on the event loop."""
+    form = await request.form()
+    email, password = form.get("email") or "", form.get("password") or ""
+    creds = Clinic.get_identity(email, with_password_hash=True)  # Clinic.authenticate
+    if creds and verify_secret(password, creds[2]):
+        Clinic.get_identity(email)  # Clinic.get_clinic_name
+        create_clinic_token(clinic_email=email, clinic_name=creds[1])
+        return RedirectResponse(url="/home/index", status_code=302)
+    return HTMLResponse("invalid")
+
+
+def build_app(legacy: bool) -> FastAPI:
+    app = FastAPI()
+    controller = AuthController()
+
+    @app.post("/auth/login")
+    async def login(request: Request):
+        return await (legacy_login(request) if legacy else controller.login(request))
+
+    return app
+
+
+async def _ticker(lags: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def run(legacy: bool, logins: int, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=build_app(legacy))
+    lags: list = []
+    stop = asyncio.Event()
+    sem = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with sem:
+                r = await client.post("/auth/login", data={"email": EMAIL, "password": PASSWORD})
+                assert r.status_code == 302, r.text
+
+        ticker = asyncio.create_task(_ticker(lags, stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(logins)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await ticker
+
+    lags_ms = sorted(l * 1000 for l in lags) or [0.0]
+    return {
+        "mode": "legacy" if legacy else "offloaded",
+        "logins/s": round(logins / elapsed, 1),
+        "lag p50 ms": round(statistics.median(lags_ms), 1),
+        "lag p99 ms": round(lags_ms[int(len(lags_ms) * 0.99) - 1 if len(lags_ms) > 1 else 0], 1),
+        "lag max ms": round(lags_ms[-1], 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--query-ms", type=float, default=2.0, help="simulated clinics query latency")
+    args = parser.parse_args()
+
+    Clinic.get_identity = staticmethod(_fake_db(args.query_ms / 1000))
+    auth_controller.print = lambda *a, **k: None  # login logs every attempt
+
+    for legacy in (True, False):
+        print(asyncio.run(run(legacy, args.logins, args.concurrency)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,24 @@
 # main.py
-from fastapi import FastAPI, Request
+import hmac
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from Backend.utils.router import Router
+from Backend.utils.tools import bots
+from Backend.services.schema_service import schema_cache_stats
+from Backend.services.sql_cache import sql_cache_stats
+from Backend.services.chart_service import chart_cache_stats
+from Backend.services.result_store import result_store_stats
+from Backend.core.limits import llm_limiter
+from Backend.core.deps import identity_cache_stats
+from Backend.config.constants import METRICS_TOKEN
+from Database.db import engine_stats
 # from Backend.api.auth import router as auth_router
 from Backend.api.history import router as history_router
 from Backend.api.uploadFile import router as upload_router
 from Backend.api.listFiles import router as list_files_router
+from Backend.api.ingestJobs import router as ingest_jobs_router
+from Backend.api.tts import router as tts_router
+from Backend.api.artifacts import router as artifacts_router
 from starlette.responses import Response, HTMLResponse, RedirectResponse, StreamingResponse
 from Database.db_register import init_db
 from Database.db_history import init_db as init_history_db
@@ -28,6 +41,9 @@ app.add_middleware(
 app.include_router(history_router)
 app.include_router(upload_router)
 app.include_router(list_files_router)
+app.include_router(ingest_jobs_router)
+app.include_router(tts_router)
+app.include_router(artifacts_router)
 
 BASE_DIR = Path(__file__).resolve().parent
 app.mount("/public", StaticFiles(directory=str(BASE_DIR / "public")), name="public")
@@ -37,9 +53,30 @@ router = Router()
 init_db()
 init_history_db()
 @app.get("/healthz")
-def healthz():
+async def healthz():
     return {"status": "ok"}
 
+def _metrics_allowed(request: Request) -> bool:
+    if not METRICS_TOKEN:
+        return False
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.encode(), METRICS_TOKEN.encode())
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    if not _metrics_allowed(request):
+        raise HTTPException(status_code=404)  # don't advertise the route without the token
+    return {
+        "agents": bots.stats(),
+        "schemas": schema_cache_stats(),
+        "sql": sql_cache_stats(),
+        "charts": chart_cache_stats(),
+        "results": result_store_stats(),
+        "identities": identity_cache_stats(),
+        "llm": llm_limiter.stats(),
+        "duckdb": engine_stats(),
+    }
+
 # Catch-all: delegate non-/api and non-/static paths to our custom Router
 @app.api_route("/{full_path:path}", methods=["GET", "POST"], response_class=HTMLResponse)
 async def handle_request(full_path: str, request: Request):
@@ -0,0 +1,46 @@
+import duckdb
+import pytest
+
+from Backend.services.chart_data import _aggregate
+from Backend.utils import tools
+
+CHARTS = ["bar", "line", "pie", "scatter", "histogram", "box"]
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    con.execute("CREATE TABLE visits AS SELECT * FROM (VALUES ('a', 1.0), ('b', 2.5), ('a', 4.0)) t(dept, cost)")
+    yield con
+    con.close()
+
+
+@pytest.mark.parametrize("chart", CHARTS)
+def test_query_ending_in_a_comment(con, chart):
+    sql = "SELECT dept, sum(cost) AS total FROM visits GROUP BY dept -- totals"
+    x = "total" if chart == "histogram" else "dept"  # histograms bin a numeric x
+    records, summary = _aggregate(con, sql, x, "total", chart)
+    assert records or any(summary.values())
+
+
+@pytest.fixture
+def make_chart(con, monkeypatch):
+    monkeypatch.setattr(tools, "clinic_tables", lambda clinic_id: ["visits"])
+    monkeypatch.setattr(tools, "chart_data", lambda clinic_id, sql, x, y, chart, allowed: _aggregate(con, sql, x, y, chart))
+
+    def no_render(*args, **kwargs):
+        raise AssertionError("empty data must not be rendered")
+
+    monkeypatch.setattr(tools, "make_chart_artifact", no_render)
+    return tools.build_chart_tool("abc123").func
+
+
+@pytest.mark.parametrize("chart", CHARTS)
+def test_empty_result_is_not_rendered(make_chart, chart):
+    reply = make_chart(x="cost", y="cost", chart=chart, sql="SELECT dept, cost FROM visits WHERE cost < 0")
+    assert reply.startswith("No numeric data to chart")
+
+
+def test_box_over_text_columns_is_not_rendered(make_chart):
+    reply = make_chart(x="dept", y="dept", chart="box", sql="SELECT dept FROM visits")
+    assert reply.startswith("No numeric data to chart")
@@ -0,0 +1,126 @@
+import os
+import tempfile
+import threading
+
+import pytest
+
+from Database.blobDownload import ChecksumMismatch, LocalDirBlob, LocalDirBucket, download_blobs
+
+# firebaseActions talks to this directory instead of Firebase
+os.environ.setdefault("LOCAL_BUCKET_DIR", os.path.join(tempfile.gettempdir(), "local-bucket"))
+
+CLINIC = "abc123"
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    bucket = LocalDirBucket(tmp_path / "bucket")
+    for i in range(6):
+        path = bucket.root / CLINIC / f"visits{i}.csv"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"day,cost\n2024-01-0{i + 1},{i}\n")
+    return bucket
+
+
+class _GatedBlob(LocalDirBlob):
+    """Downloads only once `gate` has been reached by as many blobs as it has parties."""
+
+    def __init__(self, blob: LocalDirBlob, gate: threading.Barrier):
+        super().__init__(blob._root, blob.name)
+        self._gate = gate
+
+    def download_to_file(self, file_obj) -> None:
+        self._gate.wait()
+        super().download_to_file(file_obj)
+
+
+class _FlakyBlob(LocalDirBlob):
+    """Fails the first `failures` downloads halfway through the file."""
+
+    def __init__(self, blob: LocalDirBlob, failures: int):
+        super().__init__(blob._root, blob.name)
+        self.failures = failures
+        self.attempts = 0
+
+    def download_to_file(self, file_obj) -> None:
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            file_obj.write(b"day,")
+            raise ConnectionError("connection reset")
+        super().download_to_file(file_obj)
+
+
+def test_downloads_run_in_parallel(bucket, tmp_path):
+    blobs = list(bucket.list_blobs(prefix=f"{CLINIC}/"))
+    gate = threading.Barrier(len(blobs), timeout=10)  # breaks unless all downloads overlap
+    results = download_blobs([_GatedBlob(b, gate) for b in blobs], tmp_path / "out", workers=len(blobs))
+
+    assert [r.name for r in results] == [b.name for b in blobs]
+    for blob, result in zip(blobs, results):
+        assert result.attempts == 1
+        assert result.path.read_bytes() == (bucket.root / blob.name).read_bytes()
+
+
+def test_failed_download_is_retried(bucket, tmp_path):
+    blob = _FlakyBlob(bucket.blob(f"{CLINIC}/visits0.csv"), failures=2)
+    [result] = download_blobs([blob], tmp_path / "out", retries=2, backoff=0)
+
+    assert result.attempts == blob.attempts == 3
+    assert result.path.read_bytes() == (bucket.root / blob.name).read_bytes()
+    assert not list((tmp_path / "out").glob("*.part"))
+
+
+def test_download_gives_up_after_retries(bucket, tmp_path):
+    blob = _FlakyBlob(bucket.blob(f"{CLINIC}/visits0.csv"), failures=5)
+    with pytest.raises(ConnectionError):
+        download_blobs([blob], tmp_path / "out", retries=1, backoff=0)
+
+    assert blob.attempts == 2
+    assert not list((tmp_path / "out").iterdir())
+
+
+def test_checksum_mismatch_is_not_kept(bucket, tmp_path, monkeypatch):
+    blob = bucket.blob(f"{CLINIC}/visits0.csv")
+    monkeypatch.setattr(LocalDirBlob, "md5_hash", "bm90IHRoZSBtZDU=")
+    with pytest.raises(ChecksumMismatch):
+        download_blobs([blob], tmp_path / "out", retries=1, backoff=0)
+
+    assert not list((tmp_path / "out").iterdir())
+
+
+@pytest.fixture
+def ingest(bucket, tmp_path, monkeypatch):
+    from Database import db, firebaseActions, firebaseIngest
+
+    monkeypatch.setattr(firebaseActions, "bucket", bucket)
+    monkeypatch.setattr(db, "CLINIC_DB_DIR", tmp_path / "clinics")
+    (tmp_path / "clinics").mkdir()
+    for name in ("CSV_DIR", "PARQUET_DIR", "MANIFEST_DIR"):
+        (tmp_path / name).mkdir()
+        monkeypatch.setattr(firebaseIngest, name, tmp_path / name)
+    monkeypatch.setattr(firebaseIngest, "_versions", {})
+
+    downloaded = []
+
+    def counting_download(blobs, local_dir):
+        downloaded.extend(b.name for b in blobs)
+        return download_blobs(blobs, local_dir)
+
+    monkeypatch.setattr(firebaseIngest, "download_blobs", counting_download)
+    yield firebaseIngest.ingest_clinic_from_firebase, downloaded
+    db.registry.dispose(db.clinic_db_path(CLINIC))
+
+
+def test_unchanged_blobs_are_skipped(bucket, ingest):
+    ingest_clinic, downloaded = ingest
+    first = ingest_clinic(CLINIC)
+    assert len(first.added) == len(downloaded) == 6
+
+    downloaded.clear()
+    second = ingest_clinic(CLINIC)
+    assert (second.unchanged, second.version, downloaded) == (6, first.version, [])
+
+    (bucket.root / CLINIC / "visits3.csv").write_text("day,cost\n2024-02-01,42\n")
+    third = ingest_clinic(CLINIC)
+    assert downloaded == [f"{CLINIC}/visits3.csv"]
+    assert (third.updated, third.unchanged, third.version) == ([f"{CLINIC}/visits3.csv"], 5, first.version + 1)